@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 # encoding: utf-8
 
-from lib import check_settings
+from lib import check_settings, renki_settings as settings
 from lib.database import basic_tables
 from lib.database.basic_tables import ServiceDatabase, ServiceGroupDatabase, ServerDatabase
 from lib.database import tables
 from lib.database import connection
+from lib.database import indexes, usage
 from lib.database.connection import session as dbsession
 from lib.auth import permissions
 from lib.database.user_data_table import RenkiUserDataTable
@@ -14,6 +15,8 @@ from lib.database.user_data_table import RenkiUserDataTable
 import modules
 from lib.auth import db
 
+from sqlalchemy.engine import reflection
+
 import logging
 import logging.config
 import argparse
@@ -39,6 +42,76 @@ def create_tables():
     connection.conn.create_tables()
     logger.info("All tables created")
 
+def create_indexes():
+    """
+    Create indexes missing from already existing tables
+    """
+    inspector = reflection.Inspector.from_engine(connection.conn._engine)
+    for table in tables.metadata.sorted_tables:
+        existing = [i['name'] for i in inspector.get_indexes(table.name)]
+        for index in table.indexes:
+            if index.name not in existing:
+                logger.info("Creating index %s" % index.name)
+                index.create(bind=connection.conn._engine)
+
+def index_advisor():
+    """
+    Report missing indexes and tables read with sequential scans
+    """
+    engine = connection.conn._engine
+    inspector = reflection.Inspector.from_engine(engine)
+    print("Declared foreign keys without index:")
+    for table, column in indexes.unindexed_foreign_keys(tables.metadata):
+        print("  %s.%s" % (table, column))
+    print("Declared indexes missing from database (run --sync-database):")
+    for name in indexes.missing_indexes(tables.metadata, inspector):
+        print("  %s" % name)
+    print("Foreign keys without index in database:")
+    for table, column in indexes.unindexed_foreign_keys(tables.metadata,
+                                                        inspector):
+        print("  %s.%s" % (table, column))
+    print("Tables scanned mostly sequentially:")
+    for row in indexes.seq_scan_tables(engine):
+        print("  %(relname)s: %(seq_scan)d sequential scans (%(seq_tup_read)d "
+              "rows read), %(idx_scan)d index scans, %(n_live_tup)d rows"
+              % row)
+    statements = indexes.slow_statements(engine)
+    if statements is None:
+        print("pg_stat_statements is not available")
+        return
+    print("Statements using most time:")
+    for row in statements:
+        print("  %(calls)d calls, %(total_time).1f ms total, %(mean_time).1f "
+              "ms mean, %(rows)d rows: %(query)s" % row)
+
+def reconcile_usage():
+    """
+    Fix usage counters to match real row counts
+    """
+    fixed = usage.reconcile()
+    print("Fixed %d usage counters" % fixed)
+
+def usage_report():
+    """
+    Print resource usage and limits of all users
+    """
+    result = dbsession.session().execute(
+                usage.usage_report().execution_options(stream_results=True))
+    print("%-10s %-20s %8s %10s %10s" % ('user_id', 'table', 'count',
+                                         'soft_limit', 'hard_limit'))
+    for row in result:
+        print("%-10s %-20s %8s %10s %10s" % (row.user_id, row.table,
+                                             row.count, row.soft_limit,
+                                             row.hard_limit))
+
+def purge_keys():
+    """
+    Delete expired authentication keys
+    """
+    deleted = db.AuthKeys.purge_expired(
+                    batch_size=settings.AUTH_KEY_PURGE_BATCH)
+    print("Deleted %d expired keys" % deleted)
+
 def create_limits():
     """
     Crate limits for UserDataTables
@@ -216,6 +289,14 @@ if __name__ == '__main__':
                         action="store_true", default=False)
     parser.add_argument('--drop-tables', help="Drop tables",
                         action="store_true", default=False)
+    parser.add_argument('--index-advisor', help="Report missing indexes",
+                        action="store_true", default=False)
+    parser.add_argument('--reconcile-usage', help="Fix usage counters",
+                        action="store_true", default=False)
+    parser.add_argument('--usage-report', help="Show usage of all users",
+                        action="store_true", default=False)
+    parser.add_argument('--purge-keys', help="Delete expired keys",
+                        action="store_true", default=False)
     parser.add_argument('-d', '--debug', help="Debug", action="store_true",
                         default=False)
 
@@ -229,6 +310,7 @@ if __name__ == '__main__':
     if args.sync_database is True:
         init()
         create_tables()
+        create_indexes()
         create_permissions()
         create_limits();
     elif args.development_setup is True:
@@ -238,6 +320,18 @@ if __name__ == '__main__':
     elif args.drop_tables is True:
         init()
         drop_tables()
+    elif args.index_advisor is True:
+        init()
+        index_advisor()
+    elif args.reconcile_usage is True:
+        init()
+        reconcile_usage()
+    elif args.usage_report is True:
+        init()
+        usage_report()
+    elif args.purge_keys is True:
+        init()
+        purge_keys()
     else:
         parser.print_help()
         sys.exit(1)
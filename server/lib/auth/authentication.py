@@ -59,13 +59,48 @@ class Key(object):
         self.user = user
 
     def has_permission(self, permission):
-        return self.user.have_permission(permission)
+        return self.user.has_permission(permission)
 
     def get_user(self):
         return self.user
 
+# Separates module key prefix from rest of the key
+KEY_SEPARATOR = '-'
+
+def get_key_prefix(key):
+    """
+    Return prefix of key `key` or None if key doesn't have prefix
+    """
+    if not key or not isinstance(key, str) or KEY_SEPARATOR not in key:
+        return None
+    return key.split(KEY_SEPARATOR, 1)[0]
+
 class AuthenticationModule(object):
     NAME = "NotNamed"
+    # Keys issued by module are prefixed with KEY_PREFIX, which defaults to
+    # lowercased NAME
+    KEY_PREFIX = None
+
+    @property
+    def key_prefix(self):
+        if self.KEY_PREFIX:
+            return self.KEY_PREFIX
+        return self.NAME.lower()
+
+    def tag_key(self, key):
+        """
+        Add module prefix to key `key`
+        """
+        return "%s%s%s" % (self.key_prefix, KEY_SEPARATOR, key)
+
+    def untag_key(self, key):
+        """
+        Remove module prefix from key `key`
+        returns None if key is not issued by this module
+        """
+        if get_key_prefix(key) != self.key_prefix:
+            return None
+        return key.split(KEY_SEPARATOR, 1)[1]
 
     def register_user(self, user_id, username, password,
                       firstnames='', lastname=''):
@@ -87,6 +122,12 @@ class AuthenticationModule(object):
         """
         return False
 
+    def revoke_key(self, key):
+        """
+        Revoke authentication key, used on logout
+        """
+        pass
+
     def get_user(self, key):
         """
         Get user by authentication key
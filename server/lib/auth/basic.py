@@ -3,7 +3,9 @@
 from lib.utils import generate_key
 from lib.auth.authentication import AuthenticationModule
 from lib.auth import db
+from lib.auth.cache import CachedUser, key_cache
 from lib.exceptions import DoesNotExist, AuthenticationFailed
+from lib import renki_settings as settings
 
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -21,7 +23,10 @@ class BasicAuthenticationModule(AuthenticationModule):
     NAME = "BASIC"
 
     def __init__(self):
-        pass
+        key_cache.configure(size=settings.AUTH_CACHE_SIZE,
+                            ttl=settings.AUTH_CACHE_TTL)
+        db.permission_cache.configure(size=settings.AUTH_CACHE_SIZE,
+                                      ttl=settings.AUTH_CACHE_TTL)
 
 
     def _find_key(self, key):
@@ -35,6 +40,33 @@ class BasicAuthenticationModule(AuthenticationModule):
         except DoesNotExist:
             return None
 
+    def _find_user(self, key):
+        """
+        Find user related to key, cached users are used if possible
+        """
+        if not key:
+            return None
+        hashed_key = db.hash_key(key)
+        user = key_cache.get(hashed_key)
+        if user is not None:
+            return user
+        try:
+            keyObject = db.AuthKeys.get_hashed_key(hashed_key)
+            dbuser = keyObject.get_user()
+        except DoesNotExist:
+            return None
+        if dbuser is None:
+            return None
+        user = CachedUser(user_id=dbuser.id, username=dbuser.name,
+                          firstnames=dbuser.firstnames,
+                          lastname=dbuser.lastname,
+                          permissions=dbuser.get_permission_names())
+        expires = None
+        if keyObject.expires is not None:
+            expires = keyObject.expires.timestamp()
+        key_cache.set(hashed_key, user, expires=expires)
+        return user
+
     def register_user(self, user_id, username, password,
                       firstnames='', lastname=''):
         user = db.Users()
@@ -53,35 +85,40 @@ class BasicAuthenticationModule(AuthenticationModule):
         user = self.get_by_username(username)
         if user:
             if user.check_password(password) is True:
-                apikey = generate_key()
+                apikey = self.tag_key(generate_key())
                 db.AuthKeys.add_key(user=user, key=apikey)
                 return apikey
         raise AuthenticationFailed("Invalid username or password")
 
-    def get_user(self, key):
+    def revoke_key(self, key):
         """
-        Get user related to key
+        Delete key from database
         """
         keyObject = self._find_key(key)
         if keyObject is not None:
-            return keyObject.get_user()
-        return None
+            keyObject.delete()
+
+    def get_user(self, key):
+        """
+        Get user related to key
+        """
+        return self._find_user(key)
 
     def has_permission(self, key, perm):
         """
         Returns True if user has permission perm
         else returns False
         """
-        k = self._find_key(key)
-        if k:
-            return k.has_permission(perm)
+        user = self.get_user(key)
+        if user:
+            return user.has_permission(perm)
         return False
 
     def valid_key(self, key):
         """
-        Dummy key validator
+        Key validator
         """
-        if self._find_key(key) is not None:
+        if self._find_user(key) is not None:
             return True
         return False
 
@@ -0,0 +1,55 @@
+# encoding: utf-8
+
+"""
+API key cache
+
+Maps hashed API keys to detached snapshots of authenticated users, so
+resolving key doesn't need any database queries while entry is cached.
+"""
+
+from lib.auth.authentication import User
+from lib.cache import TTLCache
+from lib import stats
+
+
+class CachedUser(User):
+    """
+    Snapshot of authenticated user and user permissions.
+    Doesn't refer to any database session, so it's safe to share between
+    requests and threads.
+    """
+    def __init__(self, user_id, username, firstnames, lastname,
+                 permissions=[]):
+        super(CachedUser, self).__init__(user_id, username, firstnames,
+                                         lastname)
+        self.permissions = frozenset(permissions)
+
+    @property
+    def id(self):
+        return self.user_id
+
+    def has_permission(self, perm):
+        return perm in self.permissions
+    has_perm = has_permission
+
+    def __str__(self):
+        return "CachedUser: %s" % self.username
+
+
+# Hashed key -> CachedUser
+key_cache = TTLCache()
+stats.register('auth_key_cache', key_cache.stats)
+
+
+def invalidate_key(hashed_key):
+    """
+    Remove key `hashed_key` from cache
+    """
+    key_cache.invalidate(hashed_key)
+
+
+def invalidate_user(user_id):
+    """
+    Remove all cached keys of user `user_id`
+    """
+    key_cache.invalidate_if(lambda key, user: user.user_id == user_id)
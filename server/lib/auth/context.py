@@ -0,0 +1,136 @@
+# encoding: utf-8
+
+"""
+Request scoped authentication context
+"""
+
+from bottle import request
+from lib import renki_settings as settings
+from lib.renki import app
+from lib.auth.authentication import get_key_prefix
+
+from functools import wraps
+
+
+ENVIRON_KEY = 'renki.auth_context'
+
+
+def get_apikey(request):
+    """
+    Get apikey from request
+    """
+    key = request.GET.get('apikey')
+    if not key and request.json and isinstance(request.json, dict):
+        key = request.json.get('apikey')
+    return key
+
+
+def find_module(key):
+    """
+    Find authentication module which issued key `key` using key prefix.
+    Returns None for unknown keys without asking any module.
+    """
+    prefix = get_key_prefix(key)
+    if prefix is None:
+        return None
+    for mod in settings.AUTHENTICATION_MODULES:
+        if mod.key_prefix == prefix:
+            return mod
+    return None
+
+
+class AuthContext(object):
+    """
+    Authentication information of one request.
+
+    API key is resolved lazily on first use and only once per request. Key
+    is routed directly to the module which issued it.
+    """
+    def __init__(self, request):
+        self._request = request
+        self._key = None
+        self._key_read = False
+        self._resolved = False
+        self._module = None
+        self._user = None
+
+    @property
+    def key(self):
+        if not self._key_read:
+            self._key = get_apikey(self._request)
+            self._key_read = True
+        return self._key
+
+    def _resolve(self):
+        if self._resolved:
+            return
+        self._resolved = True
+        key = self.key
+        if not key:
+            return
+        mod = find_module(key)
+        if mod is None:
+            return
+        user = mod.get_user(key)
+        if user is not None:
+            self._module = mod
+            self._user = user
+
+    @property
+    def module(self):
+        """
+        Authentication module which owns the key
+        """
+        self._resolve()
+        return self._module
+
+    @property
+    def user(self):
+        """
+        Authenticated user or None
+        """
+        self._resolve()
+        return self._user
+
+    @property
+    def is_authenticated(self):
+        return self.user is not None
+
+    def has_permission(self, permission):
+        """
+        Returns True if authenticated user has permission `permission`
+        """
+        user = self.user
+        if user is None:
+            return False
+        return user.has_permission(permission) is True
+
+
+class AuthContextPlugin(object):
+    """
+    Bottle plugin which creates new AuthContext for every request
+    """
+    name = 'auth_context'
+    api = 2
+
+    def apply(self, callback, route):
+        @wraps(callback)
+        def wrapper(*args, **kwargs):
+            request.environ[ENVIRON_KEY] = AuthContext(request)
+            return callback(*args, **kwargs)
+        return wrapper
+
+
+def get_auth_context():
+    """
+    Get authentication context of current request
+    """
+    try:
+        return request.environ[ENVIRON_KEY]
+    except KeyError:
+        ctx = AuthContext(request)
+        request.environ[ENVIRON_KEY] = ctx
+        return ctx
+
+
+app.install(AuthContextPlugin())
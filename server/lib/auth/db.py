@@ -7,17 +7,22 @@ Users database
 
 from lib.database.table import RenkiTable, RenkiBase
 from lib.database.tables import register_table
-from lib import renki_settings as settings
+from lib.database.connection import session as dbsession
+from lib.database import invalidation
+from lib import renki_settings as settings, stats
 from lib.database.tables import metadata
 from lib.validators import validate_user_id, validate_string, \
                            validate_positive_int
 from lib.exceptions import DoesNotExist
-from lib.utils import generate_key
+from lib.auth.cache import invalidate_key, invalidate_user, key_cache
+from lib.auth import password as password_hash
+from lib.cache import TTLCache
 
 from sqlalchemy.orm import relationship
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.schema import Table
-from sqlalchemy import Column, Unicode, Integer, DateTime, ForeignKey, or_
+from sqlalchemy import Column, Unicode, Integer, DateTime, ForeignKey, Index, \
+                       or_
 from datetime import datetime, timedelta
 from hashlib import sha512
 
@@ -25,6 +30,10 @@ import logging
 
 logger = logging.getLogger("auth.db")
 
+# User id -> frozenset of permission names
+permission_cache = TTLCache()
+stats.register('auth_permission_cache', permission_cache.stats)
+
 
 def expires_funct():
     return datetime.now() + timedelta(seconds=settings.KEY_EXPIRE_TIME)
@@ -36,11 +45,7 @@ def hash_key(key):
     return sha512(settings.AUTH_SECRET.encode("utf-8") + key).hexdigest()
 
 def hash_password(password, salt=None):
-    if isinstance(password, str):
-        password = password.encode("utf-8")
-    if salt is None:
-        salt = generate_key(size=20)
-    return "$1$%s$%s" % (salt, sha512(salt.encode("utf-8") + password).hexdigest())
+    return password_hash.hash_password(password, salt=salt)
 
 class Users(RenkiBase, RenkiTable):
     """
@@ -63,12 +68,17 @@ class Users(RenkiBase, RenkiTable):
         self.password = hash_password(password)
 
     def check_password(self, password):
-        try:
-            crap, pwtype, salt, pwhash = self.password.split('$', 3)
-        except Exception as e:
-            logger.exception(e)
+        """
+        Check password, hash is upgraded to current hasher if password
+        matches old style hash
+        """
+        if not self.password:
             return False
-        return self.password == hash_password(password, salt=salt)
+        matches, needs_rehash = password_hash.check_password(password,
+                                                             self.password)
+        if matches and needs_rehash:
+            self.set_password(password)
+        return matches
 
     def validate(self):
         validate_user_id(self.id)
@@ -80,14 +90,31 @@ class Users(RenkiBase, RenkiTable):
         return True
 
     def has_permission(self, permission):
-        for perm in self.permissions:
-            if perm.name == permission:
-                return True
-        for group in self.permission_groups:
-            for perm in group.permissions:
-                if perm.name == permission:
-                    return True
-        return False
+        return permission in Users.get_permissions(self.id)
+
+    def get_permission_names(self):
+        """
+        Return names of all permissions user has directly or via permission
+        groups
+        """
+        return Users.get_permissions(self.id)
+
+    @classmethod
+    def get_permissions(cls, user_id):
+        """
+        Return frozenset of user `user_id` permission names.
+        Permissions are fetched with single query and cached.
+        """
+        perms = permission_cache.get(user_id)
+        if perms is not None:
+            return perms
+        query = dbsession.query(Permissions.name).filter(or_(
+            Permissions.users.any(Users.id == user_id),
+            Permissions.permission_groups.any(
+                PermissionGroups.users.any(Users.id == user_id))))
+        perms = frozenset([row[0] for row in query.all()])
+        permission_cache.set(user_id, perms)
+        return perms
 
 register_table(Users)
 
@@ -103,6 +130,8 @@ class AuthKeys(RenkiBase, RenkiTable):
     user_id = Column("user_id", Integer, ForeignKey('users.id'),
                      nullable=False)
     user = relationship("Users", backref='auth_keys')
+    __table_args__ = (Index('ix_auth_keys_key', 'key', unique=True),
+                      Index('ix_auth_keys_expires', 'expires'))
 
     def validate(self):
         if self.user_id is not None:
@@ -132,9 +161,16 @@ class AuthKeys(RenkiBase, RenkiTable):
             raise DoesNotExist("Key does not exist")
         item.delete()
 
+    def delete(self):
+        invalidate_key(self.key)
+        return RenkiTable.delete(self)
+
     @classmethod
     def get_key(cls, key):
-        key = hash_key(key)
+        return cls.get_hashed_key(hash_key(key))
+
+    @classmethod
+    def get_hashed_key(cls, key):
         try:
             item = cls.query().filter(AuthKeys.key == key, or_(
                                       AuthKeys.expires > datetime.now(),
@@ -144,6 +180,24 @@ class AuthKeys(RenkiBase, RenkiTable):
             raise DoesNotExist("Key does not exist")
         return item
 
+    @classmethod
+    def purge_expired(cls, batch_size=1000):
+        """
+        Delete expired keys, `batch_size` keys per transaction
+        returns number of deleted keys
+        """
+        deleted = 0
+        while True:
+            expired = dbsession.query(AuthKeys.id).filter(
+                AuthKeys.expires <= datetime.now()).limit(batch_size)
+            count = cls.query().filter(AuthKeys.id.in_(expired.subquery())
+                                       ).delete(synchronize_session=False)
+            dbsession.commit()
+            deleted += count
+            if count < batch_size:
+                break
+        return deleted
+
     def get_user(self):
         if self.user_id is None:
             return None
@@ -235,8 +289,104 @@ class Limits(RenkiBase, RenkiTable):
     soft_limit = Column('soft_limit', Integer)
     hard_limit = Column('hard_limit', Integer)
     relationship(Users, backref="limits")
+    __table_args__ = (Index('ix_limits_users_id_table', 'users_id', 'table'),)
 
     def validate(self):
         return True
         
-register_table(Limits)
\ No newline at end of file
+register_table(Limits)
+
+
+# Table name -> (soft_limit, hard_limit), loaded on first use
+_default_limits = None
+
+# User id -> {table name: (soft_limit, hard_limit)}
+limits_cache = TTLCache()
+stats.register('limits_cache', limits_cache.stats)
+
+
+def _min(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+def combine_limits(limits):
+    """
+    Combine limit rows to dict table name -> (soft_limit, hard_limit).
+
+    Limits tables may have duplicate rows of one table, strictest limit is
+    used. Missing (NULL) limits are ignored, like min() does in usage
+    report.
+    """
+    combined = {}
+    for limit in limits:
+        soft_limit, hard_limit = combined.get(limit.table, (None, None))
+        combined[limit.table] = (_min(soft_limit, limit.soft_limit),
+                                 _min(hard_limit, limit.hard_limit))
+    return combined
+
+def load_default_limits():
+    """
+    Load default limits of all tables to cache
+    """
+    global _default_limits
+    _default_limits = combine_limits(DefaultLimits.query().all())
+    return _default_limits
+
+def get_default_limits(table):
+    """
+    Get default (soft_limit, hard_limit) of table `table` or None
+    """
+    limits = _default_limits
+    if limits is None:
+        limits = load_default_limits()
+    return limits.get(table)
+
+def get_user_limits(user_id, table):
+    """
+    Get (soft_limit, hard_limit) of user `user_id` in table `table` or None
+    if user doesn't have own limits
+    """
+    limits = limits_cache.get(user_id)
+    if limits is None:
+        limits = combine_limits(Limits.query().filter(
+                                    Limits.user_id == user_id))
+        limits_cache.set(user_id, limits)
+    return limits.get(table)
+
+def invalidate_limits(changes):
+    """
+    Drop cached limits after limits are changed
+    """
+    global _default_limits
+    for cls, id_ in changes:
+        if cls is DefaultLimits:
+            _default_limits = None
+        else:
+            # Changed rows don't tell old user id
+            limits_cache.clear()
+
+invalidation.watch([DefaultLimits, Limits], invalidate_limits)
+
+
+def invalidate_permissions(changes):
+    """
+    Drop cached permissions after users, permissions or permission groups
+    are changed.
+    """
+    user_ids = set()
+    for cls, id_ in changes:
+        if cls is not Users or id_ is None:
+            # Group and permission changes can affect any user
+            permission_cache.clear()
+            key_cache.clear()
+            return
+        user_ids.add(id_)
+    for user_id in user_ids:
+        permission_cache.invalidate(user_id)
+        invalidate_user(user_id)
+
+invalidation.watch([Users, Permissions, PermissionGroups],
+                   invalidate_permissions)
@@ -2,6 +2,8 @@
 
 from lib.exceptions import AuthenticationFailed
 from lib.utils import generate_key
+from lib.cache import TTLCache
+from lib import renki_settings as settings
 from lib.auth.authentication import User, Key, AuthenticationModule,\
      PermissionGroup
 
@@ -57,7 +59,10 @@ class DummyAuthenticationModule(AuthenticationModule):
     NAME = "DUMMY"
 
     def __init__(self):
-        self.keys = []
+        # Key string -> Key, keys expire after KEY_EXPIRE_TIME and least
+        # recently used keys are dropped when store is full
+        self.keys = TTLCache(size=settings.DUMMY_AUTH_MAX_KEYS,
+                             ttl=settings.KEY_EXPIRE_TIME)
 
         testuser = DummyUser(user_id=2, username='test', firstnames='Teemu',
                              lastname='Testaaja', groups=[dummyUserGroup])
@@ -66,16 +71,17 @@ class DummyAuthenticationModule(AuthenticationModule):
                               lastname='Ylläpitäjä', groups=[dummyAdminGroup])
         adminuser.set_password('admin')
         self.users = [testuser, adminuser]
+        self._users_by_name = dict([(u.username, u) for u in self.users])
+        self._users_by_id = dict([(u.user_id, u) for u in self.users])
 
 
     def _find_key(self, key):
         """
         Find right key
         """
-        for k in self.keys:
-            if k.key == key:
-                return k
-        return None
+        if not key:
+            return None
+        return self.keys.get(key)
 
     def authenticate(self, username, password):
         """
@@ -85,11 +91,17 @@ class DummyAuthenticationModule(AuthenticationModule):
         user = self.get_by_username(username)
         if user:
             if user.check_password(password) is True:
-                key = Key(generate_key(), user=user)
-                self.keys.append(key)
+                key = Key(self.tag_key(generate_key()), user=user)
+                self.keys.set(key.key, key)
                 return key.key
         raise AuthenticationFailed("Invalid username or password")
 
+    def revoke_key(self, key):
+        """
+        Forget key
+        """
+        self.keys.invalidate(key)
+
     def get_user(self, key):
         """
         Get user related to key
@@ -121,18 +133,12 @@ class DummyAuthenticationModule(AuthenticationModule):
         """
         Get user object by username
         """
-        for user in self.users:
-            if user.username == username:
-                return user
-        return None
+        return self._users_by_name.get(username)
 
     def get_by_user_id(self, user_id):
         """
         Get user object by user_id
         """
-        for user in self.users:
-            if user.user_id == user_id:
-                return user
-        return None
+        return self._users_by_id.get(user_id)
 
 
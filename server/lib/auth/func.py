@@ -1,8 +1,8 @@
 # encoding: utf-8
 
 from bottle import request, abort
-from lib import renki_settings as settings
 from lib.auth import permissions
+from lib.auth.context import get_auth_context, get_apikey
 
 import logging
 from functools import wraps
@@ -19,13 +19,12 @@ def authenticated(func=None, inject_user=False):
     def outer_wrapper(func):
         @wraps(func)
         def wrapped(*args, **kwargs):
-            key = get_apikey(request)
-            for mod in settings.AUTHENTICATION_MODULES:
-                if mod.valid_key(key):
-                    if inject_user:
-                        kwargs['user'] = mod.get_user(key)
-                    return func(*args, **kwargs)
-            abort(401, "Invalid or missing API key")
+            ctx = get_auth_context()
+            if not ctx.is_authenticated:
+                abort(401, "Invalid or missing API key")
+            if inject_user:
+                kwargs['user'] = ctx.user
+            return func(*args, **kwargs)
         return wrapped
     if not func:
         def normal_wrapped(function):
@@ -48,18 +47,13 @@ def require_perm(func=None, permission=None):
     def outer_wrapper(func):
         @wraps(func)
         def wrapped(*args, **kwargs):
-            key = get_apikey(request)
-            for mod in settings.AUTHENTICATION_MODULES:
-                if mod.valid_key(key):
-                    user = mod.get_user(key)
-                    if not user:
-                        logger.error('Bug: Key exist but user not found!')
-                        continue
-                    if user.has_permission(permission) is not True:
-                        abort(403, "Insufficient permissions")
-                    kwargs['user'] = user
-                    return func(*args, **kwargs)
-            abort(401, "Invalid or missing API key")
+            ctx = get_auth_context()
+            if not ctx.is_authenticated:
+                abort(401, "Invalid or missing API key")
+            if not ctx.has_permission(permission):
+                abort(403, "Insufficient permissions")
+            kwargs['user'] = ctx.user
+            return func(*args, **kwargs)
         return wrapped
     if not func:
         def normal_wrapped(function):
@@ -67,12 +61,3 @@ def require_perm(func=None, permission=None):
         return normal_wrapped
     else:
         return outer_wrapper(func)
-
-def get_apikey(request):
-    """
-    Get apikey from request
-    """
-    key = request.GET.get('apikey')
-    if not key and request.json and isinstance(request.json, dict):
-        key = request.json.get('apikey')
-    return key
@@ -0,0 +1,131 @@
+# encoding: utf-8
+
+"""
+Password hashing
+
+Hashes are calculated in bounded process pool, so slow key derivation
+doesn't block request threads.
+
+Supported hash formats:
+    $1$<salt>$<sha512>                           (legacy, verify only)
+    $pbkdf2-sha512$<iterations>$<salt>$<hash>
+    $scrypt$<n>$<r>$<p>$<salt>$<hash>
+"""
+
+from lib.utils import generate_key
+from lib import renki_settings as settings
+
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha512, pbkdf2_hmac, scrypt
+import hmac
+import threading
+
+import logging
+logger = logging.getLogger('auth.password')
+
+
+SHA512 = '1'
+PBKDF2 = 'pbkdf2-sha512'
+SCRYPT = 'scrypt'
+
+HASHERS = {'sha512': SHA512, 'pbkdf2': PBKDF2, 'scrypt': SCRYPT}
+
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _sha512(password, salt):
+    return sha512(salt.encode("utf-8") + password).hexdigest()
+
+
+def _pbkdf2(password, salt, iterations):
+    return pbkdf2_hmac('sha512', password, salt.encode("utf-8"),
+                       iterations).hex()
+
+
+def _scrypt(password, salt, n, r, p):
+    return scrypt(password, salt=salt.encode("utf-8"), n=n, r=r, p=p,
+                  maxmem=256 * n * r + 1024 * 1024).hex()
+
+
+def _run(func, *args):
+    """
+    Run func in password hashing pool, or in current thread if
+    PASSWORD_HASH_WORKERS is 0
+    """
+    global _pool
+    if not settings.PASSWORD_HASH_WORKERS:
+        return func(*args)
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                        max_workers=settings.PASSWORD_HASH_WORKERS)
+    return _pool.submit(func, *args).result()
+
+
+def _to_bytes(password):
+    if isinstance(password, str):
+        return password.encode("utf-8")
+    return password
+
+
+def _parameters(method):
+    if method == PBKDF2:
+        return [settings.PASSWORD_ITERATIONS]
+    elif method == SCRYPT:
+        return [settings.PASSWORD_SCRYPT_N, SCRYPT_R, SCRYPT_P]
+    return []
+
+
+def _derive(method, password, salt, params):
+    if method == PBKDF2:
+        return _run(_pbkdf2, password, salt, *params)
+    elif method == SCRYPT:
+        return _run(_scrypt, password, salt, *params)
+    return _sha512(password, salt)
+
+
+def hash_password(password, salt=None, method=None):
+    """
+    Hash password with configured hasher PASSWORD_HASHER
+    """
+    if method is None:
+        method = HASHERS[settings.PASSWORD_HASHER]
+    if salt is None:
+        salt = generate_key(size=20)
+    params = _parameters(method)
+    pwhash = _derive(method, _to_bytes(password), salt, params)
+    return '$' + '$'.join([method] + [str(i) for i in params] +
+                          [salt, pwhash])
+
+
+def check_password(password, encoded):
+    """
+    Check password against hash `encoded`
+    returns tuple (matches, needs_rehash)
+    """
+    try:
+        parts = encoded.split('$')
+        method = parts[1]
+        if method == SHA512:
+            params = []
+        elif method == PBKDF2:
+            params = [int(parts[2])]
+        elif method == SCRYPT:
+            params = [int(i) for i in parts[2:5]]
+        else:
+            logger.error("Unknown password hash type %s" % method)
+            return (False, False)
+        salt, pwhash = parts[2 + len(params)], parts[3 + len(params)]
+    except (AttributeError, IndexError, ValueError) as e:
+        logger.exception(e)
+        return (False, False)
+    guess = _derive(method, _to_bytes(password), salt, params)
+    if not hmac.compare_digest(guess, pwhash):
+        return (False, False)
+    needs_rehash = (method != HASHERS[settings.PASSWORD_HASHER] or
+                    params != _parameters(method))
+    return (True, needs_rehash)
@@ -0,0 +1,45 @@
+# encoding: utf-8
+
+"""
+Background purge of expired API keys
+"""
+
+from lib.auth import db
+from lib.database.connection import session as dbsession
+from lib.exceptions import Stopped
+from lib.threads import RenkiThread
+from lib import renki_settings as settings
+
+import logging
+logger = logging.getLogger('auth.purge')
+
+
+class AuthKeyPurger(RenkiThread):
+    """
+    Delete expired keys from auth_keys table every `interval` seconds
+    """
+    def __init__(self, interval=None, batch_size=None):
+        RenkiThread.__init__(self)
+        self.daemon = True
+        if interval is None:
+            interval = settings.AUTH_KEY_PURGE_INTERVAL
+        if batch_size is None:
+            batch_size = settings.AUTH_KEY_PURGE_BATCH
+        self.interval = interval
+        self.batch_size = batch_size
+
+    def purge(self):
+        try:
+            deleted = db.AuthKeys.purge_expired(batch_size=self.batch_size)
+            logger.info("Purged %d expired keys" % deleted)
+        except Exception as e:
+            logger.exception(e)
+            dbsession.rollback()
+
+    def run(self):
+        while not self.is_stopped():
+            self.purge()
+            try:
+                self.safe_wait(self.interval)
+            except Stopped:
+                break
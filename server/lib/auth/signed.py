@@ -0,0 +1,187 @@
+# encoding: utf-8
+
+from lib.auth.basic import BasicAuthenticationModule
+from lib.auth.cache import CachedUser, key_cache
+from lib.auth import db
+from lib.exceptions import AuthenticationFailed
+from lib.utils import generate_key
+from lib import renki_settings as settings
+
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from hashlib import sha256
+import binascii
+import heapq
+import hmac
+import threading
+import time
+
+import logging
+logger = logging.getLogger('SignedAuthentication')
+
+"""
+Signed key authentication module
+
+Keys are self-describing tokens "<payload>.<signature>", where payload
+contains user id, expiration time, key epoch and random nonce and signature
+is HMAC of payload signed with AUTH_SECRET. Keys are validated without
+database access.
+"""
+
+
+def _b64encode(data):
+    return urlsafe_b64encode(data).decode("ascii").rstrip('=')
+
+
+def _b64decode(data):
+    data = data + '=' * (-len(data) % 4)
+    return urlsafe_b64decode(data.encode("ascii"))
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(settings.AUTH_SECRET.encode("utf-8"),
+                               payload.encode("ascii"), sha256).digest())
+
+
+def create_key(user_id, expires=None, epoch=None):
+    """
+    Create signed key for user `user_id`
+
+    @param expires: Expiration time as unix timestamp
+    @param epoch: Key epoch, defaults to SIGNED_KEY_EPOCH
+    """
+    if expires is None:
+        expires = time.time() + settings.KEY_EXPIRE_TIME
+    if epoch is None:
+        epoch = settings.SIGNED_KEY_EPOCH
+    payload = "%d:%d:%d:%s" % (int(user_id), int(expires), int(epoch),
+                               generate_key(size=8))
+    payload = _b64encode(payload.encode("ascii"))
+    return "%s.%s" % (payload, _sign(payload))
+
+
+def parse_key(key):
+    """
+    Verify signed key `key`
+    returns tuple (user_id, expires, epoch) or None if key is not valid
+    """
+    if not key or not isinstance(key, str):
+        return None
+    try:
+        payload, signature = key.split('.', 1)
+        if not hmac.compare_digest(_sign(payload), signature):
+            return None
+        user_id, expires, epoch, nonce = \
+            _b64decode(payload).decode("ascii").split(':', 3)
+        user_id, expires, epoch = int(user_id), int(expires), int(epoch)
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        return None
+    if expires <= time.time() or epoch != settings.SIGNED_KEY_EPOCH:
+        return None
+    return (user_id, expires, epoch)
+
+
+class RevokedKeys(object):
+    """
+    Signatures of revoked keys. Signature is kept until its key expires and
+    is never dropped before that, so there is no size limit.
+    """
+    def __init__(self):
+        self._expires = {}
+        # (expires, signature) pairs in expiration order for pruning
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def add(self, signature, expires):
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if expires <= now:
+                return
+            self._expires[signature] = expires
+            heapq.heappush(self._heap, (expires, signature))
+
+    def _prune(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            expires, signature = heapq.heappop(self._heap)
+            if self._expires.get(signature) == expires:
+                del self._expires[signature]
+
+    def __contains__(self, signature):
+        expires = self._expires.get(signature)
+        return expires is not None and expires > time.time()
+
+    def __len__(self):
+        return len(self._expires)
+
+
+class SignedAuthenticationModule(BasicAuthenticationModule):
+    """
+    Authentication module with stateless signed keys.
+
+    Bumping SIGNED_KEY_EPOCH invalidates all issued keys. Revoked keys are
+    stored only in memory of this process.
+    """
+    NAME = "SIGNED"
+
+    def __init__(self):
+        super(SignedAuthenticationModule, self).__init__()
+        self.revoked = RevokedKeys()
+
+    def _parse(self, key):
+        parsed = parse_key(self.untag_key(key))
+        if parsed is None:
+            return None
+        if key.rsplit('.', 1)[1] in self.revoked:
+            return None
+        return parsed
+
+    def authenticate(self, username, password):
+        """
+        Authenticate user using username and password
+        returns signed api key if credentials are correct
+        """
+        user = self.get_by_username(username)
+        if user:
+            if user.check_password(password) is True:
+                return self.tag_key(create_key(user.id))
+        raise AuthenticationFailed("Invalid username or password")
+
+    def revoke_key(self, key):
+        """
+        Revoke key until it expires
+        """
+        parsed = self._parse(key)
+        if parsed is None:
+            return
+        signature = key.rsplit('.', 1)[1]
+        self.revoked.add(signature, parsed[1])
+        key_cache.invalidate(signature)
+
+    def valid_key(self, key):
+        """
+        Validate key signature and expiration time
+        """
+        return self._parse(key) is not None
+
+    def get_user(self, key):
+        """
+        Get user related to key
+        """
+        parsed = self._parse(key)
+        if parsed is None:
+            return None
+        signature = key.rsplit('.', 1)[1]
+        user = key_cache.get(signature)
+        if user is not None:
+            return user
+        user_id, expires, epoch = parsed
+        try:
+            dbuser = self.get_by_user_id(user_id)
+        except AuthenticationFailed:
+            return None
+        user = CachedUser(user_id=dbuser.id, username=dbuser.name,
+                          firstnames=dbuser.firstnames,
+                          lastname=dbuser.lastname,
+                          permissions=dbuser.get_permission_names())
+        key_cache.set(signature, user, expires=expires)
+        return user
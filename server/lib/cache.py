@@ -0,0 +1,113 @@
+# encoding: utf-8
+
+"""
+In-process caches
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache(object):
+    """
+    Bounded and thread-safe LRU cache which entries expire after `ttl`
+    seconds.
+
+    Entry can also have own expiration time, which is used if it's earlier
+    than cache-wide ttl.
+    """
+    def __init__(self, size=1000, ttl=60):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, size=None, ttl=None):
+        """
+        Change cache size and ttl, entries exceeding new size are evicted
+        """
+        with self._lock:
+            if size is not None:
+                self.size = size
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict()
+
+    def _evict(self):
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        """
+        Get value of `key` or `default` if key is not cached or it's expired
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                expires, value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= now:
+                del self._items[key]
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires=None):
+        """
+        Cache `value` with `key`
+
+        @param expires: Optional expiration time as unix timestamp
+        @type expires: float
+        """
+        if self.ttl:
+            ttl_expires = time.time() + self.ttl
+            if expires is None or ttl_expires < expires:
+                expires = ttl_expires
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            self._evict()
+
+    def invalidate(self, key):
+        """
+        Remove `key` from cache
+        """
+        with self._lock:
+            self._items.pop(key, None)
+
+    def invalidate_if(self, condition):
+        """
+        Remove all entries where condition(key, value) is True
+        """
+        with self._lock:
+            for key in [k for k, (e, v) in self._items.items()
+                        if condition(k, v)]:
+                del self._items[key]
+
+    def clear(self):
+        """
+        Remove all entries from cache
+        """
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        """
+        Return cache counters as dict
+        """
+        with self._lock:
+            return {'size': len(self._items), 'max_size': self.size,
+                    'ttl': self.ttl, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    def __len__(self):
+        return len(self._items)
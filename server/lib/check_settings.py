@@ -20,10 +20,38 @@ def import_modules(modules):
             import_failed = e
             break
     if import_failed:
-        raise SettingError('Cannot import module: %s' %
-                           import_failed)
+        raise rsettings.SettingError('Cannot import module: %s' %
+                                     import_failed)
     return imported_modules
 
+def check_key_prefixes(modules):
+    """
+    Every authentication module must have unique key prefix
+    """
+    prefixes = [mod.key_prefix for mod in modules]
+    for prefix in prefixes:
+        if prefixes.count(prefix) > 1:
+            raise rsettings.SettingError(
+                'Authentication modules have same key prefix %s' % prefix)
+
+def check_pool_settings():
+    """
+    Validate database connection pool and request deadline settings
+    """
+    for name in ['DB_POOL_SIZE', 'DB_POOL_MAX_OVERFLOW', 'DB_POOL_TIMEOUT',
+                 'REQUEST_DEADLINE']:
+        value = getattr(rsettings, name)
+        if not isinstance(value, (int, float)) or value < 0:
+            raise rsettings.SettingError("Invalid value %s for setting %s"
+                                         % (value, name))
+    if rsettings.DB_POOL_SIZE < 1:
+        raise rsettings.SettingError("DB_POOL_SIZE must be at least 1")
+    if not isinstance(rsettings.DB_POOL_RECYCLE, int) or \
+            rsettings.DB_POOL_RECYCLE < -1:
+        raise rsettings.SettingError("Invalid value %s for setting "
+                                     "DB_POOL_RECYCLE"
+                                     % rsettings.DB_POOL_RECYCLE)
+
 def set_settings():
     """
     Populate renki_settings module with values set in settings.py and
@@ -46,5 +74,7 @@ def set_settings():
     # Import authentication module
     rsettings.AUTHENTICATION_MODULES = import_modules(
                                             settings.AUTHENTICATION_MODULES)
+    check_key_prefixes(rsettings.AUTHENTICATION_MODULES)
+    check_pool_settings()
 
     logging.config.dictConfig(rsettings.LOGGING)
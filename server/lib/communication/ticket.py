@@ -1,57 +1,94 @@
 # encoding: utf-8
 
+"""
+Tickets tell renkiSrv instances about changed user data.
+
+Tickets of one flush are created in one batch: objects are collected and
+put to one ticket group while they are flushed, and tickets of all objects
+are inserted with one statement after flush. If flush fails, collected
+tickets are discarded on rollback.
+"""
+
 from lib.communication.ticket_tables import TicketGroupDatabase, TicketDatabase
-from lib.database import connection as dbconn
-from lib.database.basic_tables import ServiceGroupDatabase, ServerDatabase, ServiceDatabase
+from lib.communication.topology import get_services
+from lib.exceptions import Invalid, DoesNotExist
+
+from sqlalchemy.orm import object_session
 
 import logging
 logger = logging.getLogger('ticket')
 
-def create_ticket(user_data_table):
-    logger.info("Creating ticket for renkiSrv instances")
-    service_group_id = user_data_table.get_service_group_id()
+# Session info key of ticket group and tickets waiting for end of flush
+PENDING_KEY = 'renki.tickets'
 
-    ticket_group = TicketGroupDatabase()
-    ticket_group.save()
-    dbconn.session.flush()
 
-    user_data_table.ticket_group_id = ticket_group.id
-    user_data_table.real_save()
-    dbconn.session.flush()
-    
-    new_data = str(user_data_table.as_dict())
+def check_ticket(user_data_table):
+    """
+    Check that tickets can be created for `user_data_table`
 
-    History = user_data_table.__history_mapper__.class_
+    @raises Invalid: if object has no service group
+    @raises DoesNotExist: if service group doesn't exist
+    """
+    return get_services(user_data_table.get_service_group_id())
 
+
+def add_ticket(connection, user_data_table, old_data, new_data=None,
+               session=None):
+    """
+    Add ticket of `user_data_table` to ticket group of current flush.
+    Called while object is flushed, ticket group is inserted for first
+    object of flush.
+
+    @param new_data: Data of ticket, object data after flush by default
+    @param session: Session of flush, defaults to session of object
+    @returns Id of ticket group or None if object has no service group
+    """
     try:
-        History.query().filter(History.id == user_data_table.id).one()
-        old_data = "old"
-    except:
-        old_data = "new"
-
-    # Find all the servers that the ticket needs to be sent to
-    sg = ServiceGroupDatabase.query().filter(ServiceGroupDatabase.id == service_group_id).one()
-    services = ServiceDatabase.query().filter(ServiceDatabase.service_group_id == sg.id).all()
-    for s in services:
-        ticket = TicketDatabase()
-        ticket.old_data = old_data
-        ticket.new_data = new_data
-        ticket.ticket_group_id = ticket_group.id
-        ticket.save()
-
-def create_delete_ticket(user_data_table):
-    service_group_id = user_data_table.get_service_group_id()
-
-    ticket_group = TicketGroupDatabase()
-    ticket_group.save()
-    dbconn.session.flush()
-
-    # Find all the servers that the ticket needs to be sent to
-    sg = ServiceGroupDatabase.query().filter(ServiceGroupDatabase.id == service_group_id).one()
-    services = ServiceDatabase.query().filter(ServiceDatabase.service_group_id == sg.id).all()
-    for s in services:
-        ticket = TicketDatabase()
-        ticket.old_data = str(user_data_table.as_dict())
-        ticket.new_data = "deleted"
-        ticket.ticket_group_id = ticket_group.id
-        ticket.save()
+        service_group_id = user_data_table.get_service_group_id()
+    except Invalid:
+        logger.warning("No tickets for %s without service group"
+                       % user_data_table.__tablename__)
+        return None
+    if session is None:
+        session = object_session(user_data_table)
+    if PENDING_KEY not in session.info:
+        result = connection.execute(TicketGroupDatabase.__table__.insert())
+        session.info[PENDING_KEY] = (result.inserted_primary_key[0], [])
+    ticket_group_id, entries = session.info[PENDING_KEY]
+    entries.append((user_data_table, service_group_id, old_data, new_data))
+    return ticket_group_id
+
+
+def write_tickets(session):
+    """
+    Insert tickets collected by add_ticket. Called after flush.
+    """
+    try:
+        ticket_group_id, entries = session.info.pop(PENDING_KEY)
+    except KeyError:
+        return
+    logger.info("Creating tickets for %d objects" % len(entries))
+    tickets = []
+    for obj, service_group_id, old_data, new_data in entries:
+        if new_data is None:
+            new_data = str(obj.as_dict())
+        try:
+            services = get_services(service_group_id)
+        except DoesNotExist as e:
+            logger.error(str(e))
+            continue
+        for service in services:
+            tickets.append({'old_data': old_data, 'new_data': new_data,
+                            'ticket_group_id': ticket_group_id})
+    if tickets:
+        session.connection().execute(TicketDatabase.__table__.insert(),
+                                     tickets)
+
+
+def discard_tickets(session):
+    """
+    Forget tickets of failed flush, ticket group was rolled back with it.
+    Called on rollback.
+    """
+    session.info.pop(PENDING_KEY, None)
+
@@ -17,7 +17,8 @@ class TicketDatabase(RenkiBase, RenkiDataTable):
     old_data = Column('old_data', String, nullable=True)
     created = Column("created", DateTime)
     done = Column("done", DateTime, nullable=True)
-    ticket_group_id = Column(Integer, ForeignKey('ticket_group.id'))
+    ticket_group_id = Column(Integer, ForeignKey('ticket_group.id'),
+                             index=True)
     ticket_group = relationship(TicketGroupDatabase, backref="ticket_groups")
     def validate(self):
         return True
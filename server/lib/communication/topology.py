@@ -0,0 +1,99 @@
+# encoding: utf-8
+
+"""
+Cached service topology
+
+Service groups, their services and servers change rarely but are needed for
+every ticket, so they are kept in memory. Topology is reloaded after changes
+made in this process and after SERVICE_TOPOLOGY_TTL seconds, so changes made
+by other processes (e.g. admin.py) are seen.
+"""
+
+from lib.database.basic_tables import ServiceGroupDatabase, ServerDatabase, \
+    ServiceDatabase
+from lib.database import invalidation
+from lib.exceptions import DoesNotExist
+from lib.cache import TTLCache
+from lib import renki_settings as settings, stats
+
+from collections import namedtuple
+import threading
+import time
+
+import logging
+logger = logging.getLogger('ticket')
+
+Service = namedtuple('Service', ['id', 'name', 'server_id'])
+
+# Cached topology, dict of service group id -> tuple of Services. Expiration
+# is given on set, so changed SERVICE_TOPOLOGY_TTL is used without configure.
+TOPOLOGY_KEY = 'topology'
+topology_cache = TTLCache(size=1, ttl=0)
+_lock = threading.Lock()
+_loads = 0
+# Incremented on invalidation, topology loaded concurrently with changes
+# is not stored
+_generation = 0
+
+
+def load_topology():
+    """
+    Load all service groups and their services
+    """
+    global _loads
+    generation = _generation
+    topology = dict((group_id, [])
+                    for (group_id,) in ServiceGroupDatabase.query().with_entities(
+                        ServiceGroupDatabase.id))
+    for service in ServiceDatabase.query().with_entities(
+            ServiceDatabase.id, ServiceDatabase.name,
+            ServiceDatabase.server_id, ServiceDatabase.service_group_id):
+        if service.service_group_id in topology:
+            topology[service.service_group_id].append(
+                Service(service.id, service.name, service.server_id))
+    topology = dict((group_id, tuple(services))
+                    for group_id, services in topology.items())
+    with _lock:
+        if generation == _generation:
+            topology_cache.set(TOPOLOGY_KEY, topology,
+                               time.time() + settings.SERVICE_TOPOLOGY_TTL)
+        _loads += 1
+    logger.debug("Loaded topology of %d service groups" % len(topology))
+    return topology
+
+
+def get_services(service_group_id):
+    """
+    Get services of service group `service_group_id`
+
+    @raises DoesNotExist: if service group doesn't exist
+    """
+    topology = topology_cache.get(TOPOLOGY_KEY)
+    if topology is None:
+        topology = load_topology()
+    try:
+        return topology[int(service_group_id)]
+    except (KeyError, TypeError, ValueError):
+        pass
+    raise DoesNotExist('Service group id=%s does not exist'
+                       % service_group_id)
+
+
+def invalidate_topology(changes=None):
+    global _generation
+    with _lock:
+        topology_cache.invalidate(TOPOLOGY_KEY)
+        _generation += 1
+
+
+invalidation.watch([ServiceGroupDatabase, ServiceDatabase, ServerDatabase],
+                   invalidate_topology)
+
+
+def get_stats():
+    topology = topology_cache.get(TOPOLOGY_KEY)
+    return {'loaded': topology is not None, 'loads': _loads,
+            'service_groups': len(topology) if topology is not None else 0}
+
+
+stats.register('service_topology', get_stats)
@@ -5,25 +5,40 @@ This file is part of Renki project
 """
 
 from lib.database.tables import TABLES, metadata
+from lib.history_meta import versioned_session
+from lib.database.pool import RenkiQueuePool, enable_pre_ping
+from lib.database import instrumentation, deadline
 from lib.exceptions import DatabaseError
-from lib import renki_settings as settings, renki
-from lib.utils import thread_local
+from lib.cache import TTLCache
+from lib.auth.context import get_apikey
+from lib import renki_settings as settings, renki, stats
+from lib.utils import thread_local, close_after
 
+from bottle import request, HTTPResponse, HTTPError
 from sqlalchemy import create_engine
 from sqlalchemy.engine import url
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import func
+from sqlalchemy import func, event
 
+from contextlib import contextmanager, ExitStack
+from functools import wraps
+import itertools
+import types
 import logging
 logger = logging.getLogger('dbconnection')
 
 conn = None
 
+# Session info key for read-only sessions
+READ_ONLY = 'renki.read_only'
+
 class DBConnection(object):
     def __init__(self, database, username, password, host, port=5432,
-                 echo=False):
+                 echo=False, replicas=None):
         """
         Initialize object
+
+        @param replicas: Database URLs of read replicas
         """
         self._database = database
         self._password = password
@@ -35,9 +50,13 @@ class DBConnection(object):
         self.__metadata = None
         self.__base = None
         self._echo = echo
+        self._replicas = replicas or []
+        self._replica_engines = []
+        self._replica_cycle = None
         logger.info("Connecting to database")
         self._engine.connect()
         self._sessionmaker = None
+        self._read_sessionmaker = None
         self.connect()
         logger.info("Database connection initialized")
         self._register_tables()
@@ -75,8 +94,37 @@ class DBConnection(object):
         if self._sessionmaker is None:
             self._sessionmaker = sessionmaker(bind=self._engine,
                                               autocommit=False)
+            # Every session writes history of versioned tables
+            versioned_session(self._sessionmaker)
         return self._sessionmaker()
 
+    @property
+    def has_replicas(self):
+        return len(self._replica_engines) > 0
+
+    def create_read_session(self, replica=False):
+        """
+        Initialize read-only session
+
+        Session runs every query in autocommit mode, so reads don't need
+        BEGIN or COMMIT and connection is returned to pool after each query.
+
+        @param replica: Use read replica if replicas are configured
+        """
+        if self._read_sessionmaker is None:
+            engine = self._engine.execution_options(
+                                            isolation_level='AUTOCOMMIT')
+            self._read_sessionmaker = sessionmaker(bind=engine,
+                                                   autocommit=True)
+            event.listen(self._read_sessionmaker, 'before_flush',
+                         deny_flush)
+        if replica and self._replica_cycle is not None:
+            ses = self._read_sessionmaker(bind=next(self._replica_cycle))
+        else:
+            ses = self._read_sessionmaker()
+        ses.info[READ_ONLY] = True
+        return ses
+
     def _create_engine(self):
         """
         Initialize engine
@@ -85,10 +133,46 @@ class DBConnection(object):
                         username=self._username, password=self._password,
                         host=self._host, database=self._database,
                         port=self._port)
+        self.__engine = self._new_engine(dburl)
+        stats.register('db_pool', self.pool_stats)
+
+    def _new_engine(self, dburl):
         # Note: pool_size defines the number of connections to keep open
         # inside the connection pool.
-        self.__engine = create_engine(dburl, echo=self._echo, pool_timeout=10,
-                                      pool_size=5)
+        engine = create_engine(dburl, echo=self._echo,
+                               poolclass=RenkiQueuePool,
+                               pool_size=settings.DB_POOL_SIZE,
+                               max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+                               pool_timeout=settings.DB_POOL_TIMEOUT,
+                               pool_recycle=settings.DB_POOL_RECYCLE)
+        if settings.DB_POOL_PRE_PING:
+            enable_pre_ping(engine)
+        instrumentation.instrument(engine)
+        deadline.instrument(engine)
+        return engine
+
+    def _create_replica_engines(self):
+        """
+        Initialize read replica engines, replicas are used in round robin
+        """
+        self._replica_engines = []
+        for n, dburl in enumerate(self._replicas):
+            engine = self._new_engine(dburl)
+            stats.register('db_pool_replica_%d' % n,
+                           lambda engine=engine: engine.pool.stats())
+            self._replica_engines.append(engine.execution_options(
+                                            isolation_level='AUTOCOMMIT'))
+        if self._replica_engines:
+            logger.info("Using %d read replicas" % len(self._replica_engines))
+            self._replica_cycle = itertools.cycle(self._replica_engines)
+        else:
+            self._replica_cycle = None
+
+    def pool_stats(self):
+        """
+        Statistics of connection pool
+        """
+        return self._engine.pool.stats()
 
 
     def _register_tables(self):
@@ -103,6 +187,7 @@ class DBConnection(object):
         Connect to database
         """
         self._create_engine()
+        self._create_replica_engines()
         self._create_metadata()
 
     def create_tables(self):
@@ -142,11 +227,94 @@ class DBConnection(object):
         return self.__str__()
 
 
+def deny_flush(ses, flush_context, instances):
+    """
+    Prevent writes in read-only sessions
+    """
+    raise DatabaseError("Cannot save changes in read-only request")
+
+
+def close_session(ses):
+    """
+    Close session and release all objects loaded in it
+    """
+    logger.debug("Closing session, %d objects in identity map"
+                 % len(ses.identity_map))
+    ses.close()
+
+
+# Clients which have written recently are pinned to primary database for
+# DB_REPLICA_PIN_SECONDS, so they see their own writes
+primary_pins = TTLCache(size=100000, ttl=settings.DB_REPLICA_PIN_SECONDS)
+
+def client_id():
+    """
+    Identify client of current request by API key or address
+    """
+    try:
+        return get_apikey(request) or request.remote_addr
+    except (RuntimeError, KeyError, AttributeError):
+        # Not inside request
+        return None
+
+def pin_primary():
+    """
+    Pin client of current request to primary database
+    """
+    cid = client_id()
+    if cid:
+        primary_pins.set(cid, True)
+
+def is_pinned():
+    """
+    Returns True if client of current request must read from primary
+    """
+    cid = client_id()
+    return cid is not None and primary_pins.get(cid) is not None
+
+
+_trace_counter = itertools.count(1)
+
+def trace_transaction():
+    """
+    Returns True if id of current transaction should be logged.
+
+    Tracing is enabled for every DB_TRACE_TXID_SAMPLE:th transaction and for
+    requests having DB_TRACE_TXID_HEADER header.
+    """
+    sample = settings.DB_TRACE_TXID_SAMPLE
+    if sample and next(_trace_counter) % sample == 0:
+        return True
+    if settings.DB_TRACE_TXID_HEADER:
+        try:
+            return bool(request.get_header(settings.DB_TRACE_TXID_HEADER))
+        except (RuntimeError, KeyError, AttributeError):
+            # Not inside request
+            pass
+    return False
+
+def log_transaction_id(ses, action):
+    """
+    Log id of current transaction of session `ses` if tracing is enabled.
+    Costs extra query, so it's done only for traced transactions.
+    """
+    if not trace_transaction():
+        return
+    try:
+        xid = ses.query(func.txid_current()).scalar()
+        logger.info("%s transaction id: %s" % (action, xid))
+    except Exception as e:
+        logger.warning("Cannot get transaction id: %s" % e)
+
+
 class LocalDBSession(object):
     """
     Thread-local session object.
     """
     _session = thread_local(name="session")
+    _read_session = thread_local(name="read_session")
+    _report_session = thread_local(name="report_session")
+    _owns_session = thread_local(name="owns_session")
 
     def query(self, *args, **kwargs):
         ses = self.session()
@@ -161,7 +329,44 @@ class LocalDBSession(object):
     def flush(self, *args, **kwargs):
         return self.session().flush(*args, **kwargs)
 
+    def has_session(self):
+        """
+        Returns True if session exists in this thread
+        """
+        try:
+            self._session
+            return True
+        except RuntimeError:
+            return False
+
+    def begin_request(self):
+        """
+        Begin request scope. Session created during request is closed at
+        the end of request, existing session (e.g. in tests) is kept.
+        """
+        self._owns_session = not self.has_session()
+
+    def end_request(self):
+        """
+        End request scope and close sessions created during request
+        """
+        try:
+            owns = self._owns_session
+        except RuntimeError:
+            return
+        del self._owns_session
+        self.close_report_session()
+        if not owns or not self.has_session():
+            return
+        ses = self._session
+        del self._session
+        close_session(ses)
+
     def session(self):
+        try:
+            return self._read_session
+        except RuntimeError:
+            pass
         try:
             return self._session
         except RuntimeError:
@@ -169,14 +374,53 @@ class LocalDBSession(object):
             self._session = ses
         return self._session
 
+    def report_query(self, *args, **kwargs):
+        """
+        Query for reporting, like history listings. Query is run in read
+        replica unless client is pinned to primary database.
+        """
+        if self.is_read_only() or not conn.has_replicas or is_pinned():
+            return self.query(*args, **kwargs)
+        try:
+            ses = self._report_session
+        except RuntimeError:
+            ses = conn.create_read_session(replica=True)
+            self._report_session = ses
+        return ses.query(*args, **kwargs)
+
+    def close_report_session(self):
+        try:
+            ses = self._report_session
+        except RuntimeError:
+            return
+        del self._report_session
+        close_session(ses)
+
+    def is_read_only(self):
+        return self.session().info.get(READ_ONLY, False)
+
+    @contextmanager
+    def read_only(self, replica=False):
+        """
+        Use read-only session in this thread inside with block
+
+        @param replica: Use read replica if replicas are configured
+        """
+        ses = conn.create_read_session(replica=replica)
+        self._read_session = ses
+        try:
+            yield ses
+        finally:
+            del self._read_session
+            close_session(ses)
+
     def commit(self, *args, **kwargs):
         ses = self.session()
-        try:
-           xid = ses.query(func.txid_current()).first()
-           logger.info("Transaction id: %s" % xid)
-           logger.debug("Commit")
-        except Exception as e:
-            logger.exception(e)
+        if ses.info.get(READ_ONLY, False):
+            # Nothing to commit
+            return
+        log_transaction_id(ses, "Commit")
+        logger.debug("Commit")
         return ses.commit(*args, **kwargs)
 
     def safe_commit(self, *args, **kwargs):
@@ -197,6 +441,65 @@ class LocalDBSession(object):
 
 session = LocalDBSession()
 
+
+class TransactionPlugin(object):
+    """
+    Bottle plugin which runs each route in transaction.
+
+    Read-only routes (GET routes unless route is defined with
+    read_only=False) use read-only session without commit, on read replica
+    if client hasn't written recently. Other routes are committed before
+    response is returned, so commit errors are reported to client.
+
+    Sessions created during request are closed when request ends, so
+    loaded objects don't accumulate in long living threads. If route
+    returns generator, e.g. streamed response, sessions are closed after
+    response is written.
+    """
+    name = 'transaction'
+    api = 2
+
+    def apply(self, callback, route):
+        read_only = route.config.get('read_only', route.method == 'GET')
+
+        def write(*args, **kwargs):
+            try:
+                ret = callback(*args, **kwargs)
+            except HTTPResponse as e:
+                if isinstance(e, HTTPError):
+                    session.rollback()
+                else:
+                    session.safe_commit()
+                    pin_primary()
+                raise
+            except:
+                session.rollback()
+                raise
+            session.safe_commit()
+            pin_primary()
+            return ret
+
+        @wraps(callback)
+        def wrapper(*args, **kwargs):
+            stack = ExitStack()
+            session.begin_request()
+            stack.callback(session.end_request)
+            try:
+                if read_only:
+                    replica = conn.has_replicas and not is_pinned()
+                    stack.enter_context(session.read_only(replica=replica))
+                    ret = callback(*args, **kwargs)
+                else:
+                    ret = write(*args, **kwargs)
+            except:
+                stack.close()
+                raise
+            if isinstance(ret, types.GeneratorType):
+                return close_after(ret, stack)
+            stack.close()
+            return ret
+        return wrapper
+
 def initialize_connection(unittest=False, echo=False):
     """
     Create global database connection
@@ -210,13 +513,9 @@ def initialize_connection(unittest=False, echo=False):
     else:
         conn = DBConnection(settings.DB_DATABASE, settings.DB_USER,
                             settings.DB_PASSWORD, settings.DB_SERVER,
-                            settings.DB_PORT, echo=echo)
-    # Add forced commit hook
-    @renki.app.hook('after_request')
-    def force_commit():
-        # Note: this isn't probably good idea
-        # If commit fails, data already sent to user, is lost.
-        try:
-            session.safe_commit()
-        except Exception as e:
-            logger.exception(e)
+                            settings.DB_PORT, echo=echo,
+                            replicas=settings.DB_REPLICAS)
+    primary_pins.configure(ttl=settings.DB_REPLICA_PIN_SECONDS)
+    renki.app.install(instrumentation.SQLStatsPlugin())
+    renki.app.install(deadline.DeadlinePlugin())
+    renki.app.install(TransactionPlugin())
@@ -0,0 +1,259 @@
+# encoding: utf-8
+
+"""
+Request deadlines
+
+Every request has deadline, REQUEST_DEADLINE seconds by default or
+`deadline` given in route config. Remaining time of deadline is applied to
+PostgreSQL connections as statement_timeout, and statements aren't started
+after deadline has passed. Requests exceeding deadline are aborted with
+RequestTimeout.
+"""
+
+from lib.exceptions import RequestTimeout
+from lib import renki_settings as settings, stats
+
+from collections import defaultdict
+from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+import threading
+import time
+import types
+
+import logging
+logger = logging.getLogger('sql')
+
+# PostgreSQL error code of canceled statement
+QUERY_CANCELED = '57014'
+
+# Deadline and statement_timeout currently set to connection, in connection
+# info. New connections have no timeout.
+TIMEOUT_KEY = 'renki.statement_timeout'
+# Timeout of connection is not known after rollback
+TIMEOUT_UNKNOWN = (None, None)
+
+# statement_timeout is set again when remaining time of deadline is this
+# fraction shorter than timeout set to connection
+TIMEOUT_SLACK = 0.1
+
+_local = threading.local()
+_lock = threading.Lock()
+
+# Timeouts per route
+route_timeouts = defaultdict(int)
+
+
+class DeadlineExceeded(Exception):
+    """
+    Statement was not started because request deadline has passed
+    """
+    pass
+
+
+class Deadline(object):
+    """
+    Deadline of one request
+    """
+    def __init__(self, name, seconds):
+        self.name = name
+        self.seconds = seconds
+        self.expires = time.time() + seconds
+        self.exceeded = False
+
+    @property
+    def statement_timeout(self):
+        """
+        Timeout of statement started now in milliseconds, statement may
+        not run past deadline
+        """
+        return max(1, int(self.remaining() * 1000))
+
+    def remaining(self):
+        return self.expires - time.time()
+
+
+def current():
+    """
+    Deadline of current request or None
+    """
+    return getattr(_local, 'deadline', None)
+
+
+def begin(name, seconds):
+    """
+    Start deadline of request `name`, 0 or None disables deadline
+    """
+    if seconds:
+        _local.deadline = Deadline(name, seconds)
+    else:
+        _local.deadline = None
+    return _local.deadline
+
+
+def end():
+    deadline = current()
+    _local.deadline = None
+    return deadline
+
+
+def is_query_canceled(exc):
+    """
+    Returns True if `exc` is error of statement canceled by
+    statement_timeout
+    """
+    if isinstance(exc, DBAPIError):
+        exc = exc.orig
+    return getattr(exc, 'pgcode', None) == QUERY_CANCELED
+
+
+def new_timeout(deadline, current=(None, 0)):
+    """
+    Returns statement_timeout to set for `deadline` or None if timeout
+    currently set is still good
+
+    @param current: Deadline and timeout currently set to connection,
+                    timeout is None if it is not known
+    """
+    owner, timeout = current
+    if deadline is None:
+        # Connections outside requests don't have timeout
+        return 0 if timeout != 0 else None
+    wanted = deadline.statement_timeout
+    # Timeout is set when request changes and again only when it has shrunk
+    # noticeably, not before every statement
+    if owner is not deadline or timeout is None or \
+            timeout > wanted * (1 + TIMEOUT_SLACK):
+        return wanted
+    return None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    deadline = current()
+    if deadline is not None and deadline.remaining() <= 0:
+        deadline.exceeded = True
+        raise DeadlineExceeded("Deadline of %s exceeded" % deadline.name)
+    if conn.dialect.name != 'postgresql':
+        return
+    timeout = new_timeout(deadline, conn.info.get(TIMEOUT_KEY, (None, 0)))
+    if timeout is None:
+        return
+    # `cursor` may be server side cursor of streamed statement, which can
+    # run only one statement
+    setter = conn.connection.cursor()
+    try:
+        setter.execute("SET statement_timeout = %d" % timeout)
+    finally:
+        setter.close()
+    conn.info[TIMEOUT_KEY] = (deadline, timeout)
+
+
+def reset_timeout(conn, *args):
+    """
+    Rollback reverts SET to value before transaction, which may be timeout
+    of earlier request, and doesn't revert SET of autocommit connection.
+    Timeout is not known anymore, so next statement sets it again.
+    """
+    conn.info[TIMEOUT_KEY] = TIMEOUT_UNKNOWN
+
+
+def dbapi_error(conn, cursor, statement, parameters, context, exception):
+    if is_query_canceled(exception):
+        deadline = current()
+        if deadline is not None:
+            deadline.exceeded = True
+
+
+def handle_error(context):
+    dbapi_error(context.connection, context.cursor, context.statement,
+                context.parameters, context.execution_context,
+                context.original_exception)
+
+
+def instrument(engine):
+    """
+    Apply request deadlines to statements executed with engine `engine`
+    """
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'rollback', reset_timeout)
+    event.listen(engine, 'rollback_savepoint', reset_timeout)
+    # handle_error replaces dbapi_error in newer SQLAlchemy versions
+    if hasattr(engine.dispatch, 'handle_error'):
+        event.listen(engine, 'handle_error', handle_error)
+    else:
+        event.listen(engine, 'dbapi_error', dbapi_error)
+
+
+def get_stats():
+    with _lock:
+        return dict(route_timeouts)
+
+
+stats.register('deadlines', get_stats)
+
+
+class DeadlinePlugin(object):
+    """
+    Bottle plugin running every request with deadline. Route specific
+    deadline is given as route config, e.g.
+    @app.get('/report', deadline=60)
+
+    Deadline of streamed response lasts until response is written.
+    """
+    name = 'deadline'
+    api = 2
+
+    def apply(self, callback, route):
+        name = '%s %s' % (route.method, route.rule)
+
+        def timed_out(deadline, seconds, e):
+            """
+            Returns True if error `e` was caused by exceeded deadline
+            """
+            if deadline is None or isinstance(e, RequestTimeout):
+                return False
+            # Routes may wrap database errors to other errors, so
+            # deadline is checked instead of error type
+            if not (deadline.exceeded or is_query_canceled(e)):
+                return False
+            with _lock:
+                route_timeouts[name] += 1
+            logger.warning("Request %s exceeded deadline of %s seconds"
+                           % (name, seconds))
+            return True
+
+        def stream(gen, deadline, seconds):
+            try:
+                for item in gen:
+                    yield item
+            except Exception as e:
+                # Status is already sent, error can only be logged
+                timed_out(deadline, seconds, e)
+                raise
+            finally:
+                gen.close()
+                end()
+
+        @wraps(callback)
+        def wrapper(*args, **kwargs):
+            seconds = route.config.get('deadline')
+            if seconds is None:
+                seconds = settings.REQUEST_DEADLINE
+            deadline = begin(name, seconds)
+            try:
+                ret = callback(*args, **kwargs)
+            except Exception as e:
+                end()
+                if timed_out(deadline, seconds, e):
+                    raise RequestTimeout("Request exceeded deadline of %s "
+                                         "seconds" % seconds)
+                raise
+            except:
+                end()
+                raise
+            if isinstance(ret, types.GeneratorType):
+                return stream(ret, deadline, seconds)
+            end()
+            return ret
+        return wrapper
@@ -7,6 +7,11 @@ Some commonly used filters
 from lib.validators import is_positive_numeric
 from lib.exceptions import Invalid
 
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from sqlalchemy import tuple_
+import binascii
+import json
+
 def do_limits(query, limit, offset=None):
     """
     Apply limit and offset to query
@@ -22,3 +27,119 @@ def do_limits(query, limit, offset=None):
                 raise Invalid('Lower limit must be positive integer')
             query = query.offset(int(offset))
     return query
+
+
+class Page(list):
+    """
+    One page of results, `next` is cursor of the next page or None if this
+    is the last page
+    """
+    def __init__(self, items, next=None):
+        super(Page, self).__init__(items)
+        self.next = next
+
+
+def encode_cursor(values):
+    """
+    Encode keyset values to opaque cursor string
+    """
+    data = json.dumps(values, separators=(',', ':')).encode("utf-8")
+    return urlsafe_b64encode(data).decode("ascii").rstrip('=')
+
+
+def _python_type(column):
+    try:
+        return column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def _valid_value(column, value):
+    """
+    Check that cursor value can be compared to `column`
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return False
+    python_type = _python_type(column)
+    if python_type is int:
+        return isinstance(value, int)
+    if python_type is float:
+        return isinstance(value, (int, float))
+    if python_type is str:
+        return isinstance(value, str)
+    return True
+
+
+def decode_cursor(cursor, columns):
+    """
+    Decode cursor created by encode_cursor, cursor has to contain one value
+    of matching type for each keyset column
+
+    @raises Invalid: if cursor is not valid
+    """
+    try:
+        data = urlsafe_b64decode((cursor + '=' * (-len(cursor) % 4)
+                                  ).encode("ascii"))
+        values = json.loads(data.decode("utf-8"))
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        raise Invalid('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise Invalid('Invalid cursor')
+    for column, value in zip(columns, values):
+        if not _valid_value(column, value):
+            raise Invalid('Invalid cursor')
+    return values
+
+
+def _value(item, key):
+    if isinstance(item, dict):
+        return item[key]
+    return getattr(item, key)
+
+
+def paginate(query, columns, limit=None, cursor=None, offset=None,
+             fetch=None, stream=False):
+    """
+    Keyset pagination, results are ordered by `columns` and page starts
+    after row given in `cursor`, so every page costs same as the first one.
+
+    @param columns: Unique indexed column or list of columns, e.g. Table.id
+    @param cursor: Cursor returned with previous page
+    @param offset: Deprecated offset, use cursor instead
+    @param fetch: Function which executes query, defaults to query.all()
+    @param stream: Return ordered and limited query without executing it,
+                   streamed responses don't have next page cursor
+    @returns Page
+    @raises Invalid: if limit or cursor is invalid
+    """
+    if not isinstance(columns, (list, tuple)):
+        columns = [columns]
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if len(columns) == 1:
+            query = query.filter(columns[0] > values[0])
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+    query = query.order_by(*columns)
+    if limit:
+        if is_positive_numeric(limit) is not True:
+            raise Invalid('Limit must be positive integer')
+        limit = int(limit)
+        # Fetch one extra row to know if there is next page
+        query = query.limit(limit if stream else limit + 1)
+    if offset:
+        if is_positive_numeric(offset) is not True:
+            raise Invalid('Lower limit must be positive integer')
+        query = query.offset(int(offset))
+    if stream:
+        return query
+    if fetch is None:
+        items = query.all()
+    else:
+        items = fetch(query)
+    if not limit or len(items) <= limit:
+        return Page(items)
+    items = items[:limit]
+    last = items[-1]
+    return Page(items, next=encode_cursor([_value(last, c.key)
+                                           for c in columns]))
@@ -0,0 +1,110 @@
+# encoding: utf-8
+
+"""
+Index advisor
+
+Finds foreign keys without index and tables read mostly by sequential scans
+using PostgreSQL statistics views.
+"""
+
+from sqlalchemy import text, UniqueConstraint
+from sqlalchemy.exc import SQLAlchemyError
+
+import logging
+logger = logging.getLogger('dbconnection')
+
+# Tables smaller than this are cheap to scan and not reported
+MIN_ROWS = 1000
+
+
+def _leading_columns(table, inspector=None):
+    """
+    Return names of first columns of indexes, unique constraints and primary
+    key of `table`
+    """
+    if inspector is None:
+        indexes = [[c.name for c in index.columns] for index in table.indexes]
+        indexes += [[c.name for c in constraint.columns]
+                    for constraint in table.constraints
+                    if isinstance(constraint, UniqueConstraint)]
+        primary_key = [c.name for c in table.primary_key.columns]
+    else:
+        indexes = [i['column_names'] for i in inspector.get_indexes(table.name)]
+        indexes += [c['column_names']
+                    for c in inspector.get_unique_constraints(table.name)]
+        primary_key = inspector.get_pk_constraint(table.name).get(
+                            'constrained_columns') or []
+    leading = set(columns[0] for columns in indexes if columns)
+    if primary_key:
+        leading.add(primary_key[0])
+    return leading
+
+
+def unindexed_foreign_keys(metadata, inspector=None):
+    """
+    Find foreign key columns which are not first column of any index
+
+    @param inspector: Check indexes existing in database instead of
+                      indexes declared in `metadata`
+    @returns list of (table name, column name) tuples
+    """
+    missing = []
+    if inspector is not None:
+        existing = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if inspector is not None and table.name not in existing:
+            continue
+        leading = _leading_columns(table, inspector)
+        for fk in table.foreign_keys:
+            if fk.parent.name not in leading:
+                missing.append((table.name, fk.parent.name))
+    return sorted(set(missing))
+
+
+def missing_indexes(metadata, inspector):
+    """
+    Names of indexes declared in `metadata` but not created to database
+    """
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = set(i['name'] for i in inspector.get_indexes(table.name))
+        missing.extend(index.name for index in table.indexes
+                       if index.name not in existing)
+    return sorted(missing)
+
+
+def seq_scan_tables(engine, min_rows=MIN_ROWS):
+    """
+    Tables with at least `min_rows` rows which are scanned sequentially
+    more often than with index, from pg_stat_user_tables
+    """
+    query = text("""SELECT relname, seq_scan, seq_tup_read,
+                           COALESCE(idx_scan, 0) AS idx_scan, n_live_tup
+                    FROM pg_stat_user_tables
+                    WHERE n_live_tup >= :min_rows
+                      AND seq_scan > COALESCE(idx_scan, 0)
+                    ORDER BY seq_tup_read DESC""")
+    return [dict(row) for row in engine.execute(query, min_rows=min_rows)]
+
+
+def slow_statements(engine, limit=10):
+    """
+    Statements using most database time from pg_stat_statements, or None
+    if pg_stat_statements extension is not installed
+    """
+    # Column names changed in PostgreSQL 13
+    for total, mean in (('total_exec_time', 'mean_exec_time'),
+                        ('total_time', 'mean_time')):
+        query = text("""SELECT query, calls, %s AS total_time,
+                               %s AS mean_time, rows
+                        FROM pg_stat_statements
+                        ORDER BY %s DESC
+                        LIMIT :limit""" % (total, mean, total))
+        try:
+            return [dict(row) for row in engine.execute(query, limit=limit)]
+        except SQLAlchemyError as e:
+            logger.debug("Cannot read pg_stat_statements: %s" % e)
+    return None
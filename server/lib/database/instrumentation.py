@@ -0,0 +1,173 @@
+# encoding: utf-8
+
+"""
+SQL instrumentation
+
+Counts statements and database time of each request, logs slow queries and
+statements repeated many times during one request (likely N+1 queries).
+"""
+
+from bottle import response, HTTPResponse
+from lib.utils import close_after
+from lib import renki_settings as settings, stats
+
+from collections import defaultdict
+from contextlib import ExitStack
+from functools import wraps
+from sqlalchemy import event
+import threading
+import time
+import types
+
+import logging
+logger = logging.getLogger('sql')
+
+_local = threading.local()
+_lock = threading.Lock()
+
+# Totals per route
+route_stats = defaultdict(lambda: {'requests': 0, 'statements': 0,
+                                   'time': 0.0, 'slow': 0, 'nplusone': 0})
+
+
+class RequestStats(object):
+    """
+    SQL statistics of one request
+    """
+    def __init__(self, name):
+        self.name = name
+        self.statements = 0
+        self.time = 0.0
+        self.slow = 0
+        self.shapes = defaultdict(int)
+        self.nplusone = []
+
+    def add(self, statement, duration):
+        self.statements += 1
+        self.time += duration
+        self.shapes[statement] += 1
+        if self.shapes[statement] == settings.SQL_NPLUSONE_THRESHOLD:
+            self.nplusone.append(statement)
+            logger.warning("Possible N+1 query in %s, statement run %d "
+                           "times: %s" % (self.name, self.shapes[statement],
+                                          statement))
+
+
+def current():
+    """
+    Statistics of current request or None
+    """
+    return getattr(_local, 'stats', None)
+
+
+def begin(name):
+    _local.stats = RequestStats(name)
+    return _local.stats
+
+
+def end():
+    """
+    End current request and add its statistics to route totals
+    """
+    req = current()
+    if req is None:
+        return None
+    _local.stats = None
+    with _lock:
+        totals = route_stats[req.name]
+        totals['requests'] += 1
+        totals['statements'] += req.statements
+        totals['time'] += req.time
+        totals['slow'] += req.slow
+        totals['nplusone'] += len(req.nplusone)
+    return req
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    conn.info.setdefault('renki.query_start', []).append(time.time())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    try:
+        duration = time.time() - conn.info['renki.query_start'].pop()
+    except (KeyError, IndexError):
+        return
+    req = current()
+    if duration >= settings.SQL_SLOW_QUERY_TIME:
+        logger.warning("Slow query (%.3f s) in %s: %s" % (
+                       duration, req.name if req else 'no request',
+                       statement))
+        if req is not None:
+            req.slow += 1
+    if req is not None:
+        req.add(statement, duration)
+
+
+def instrument(engine):
+    """
+    Collect statistics of statements executed with engine `engine`
+    """
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+def get_stats():
+    with _lock:
+        return dict((name, dict(values))
+                    for name, values in route_stats.items())
+
+
+stats.register('sql', get_stats)
+
+
+class SQLStatsPlugin(object):
+    """
+    Bottle plugin collecting SQL statistics of every request. In DEBUG mode
+    counters are also returned in response headers.
+
+    Statements of streamed responses are counted until response is written.
+    """
+    name = 'sql_stats'
+    api = 2
+
+    def apply(self, callback, route):
+        name = '%s %s' % (route.method, route.rule)
+
+        def finish(result=None):
+            req = end()
+            if not settings.DEBUG or req is None:
+                return
+            headers = [('X-Renki-SQL-Count', str(req.statements)),
+                       ('X-Renki-SQL-Time', '%.3f' % req.time)]
+            if req.nplusone:
+                headers.append(('X-Renki-SQL-NPlusOne',
+                                str(len(req.nplusone))))
+            # Returned or raised HTTPResponse replaces headers of response
+            targets = [response]
+            if isinstance(result, HTTPResponse):
+                targets.append(result)
+            for target in targets:
+                for header, value in headers:
+                    target.set_header(header, value)
+
+        @wraps(callback)
+        def wrapper(*args, **kwargs):
+            begin(name)
+            try:
+                ret = callback(*args, **kwargs)
+            except HTTPResponse as e:
+                finish(e)
+                raise
+            except:
+                finish()
+                raise
+            if isinstance(ret, types.GeneratorType):
+                # Headers are sent before streamed statements are run
+                stack = ExitStack()
+                stack.callback(end)
+                return close_after(ret, stack)
+            finish(ret)
+            return ret
+        return wrapper
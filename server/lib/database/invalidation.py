@@ -0,0 +1,68 @@
+# encoding: utf-8
+
+"""
+Invalidate in-process caches when database objects change
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+
+import logging
+logger = logging.getLogger('dbconnection')
+
+
+PENDING_KEY = 'renki.invalidate'
+
+_watchers = []
+
+
+def watch(classes, callback):
+    """
+    Call `callback(changes)` when instances of `classes` are added, modified
+    or deleted. `changes` is list of (class, id) tuples.
+
+    Callback is called after flush, so session sees its own changes, and
+    again when transaction ends, so values cached by other threads from
+    uncommitted state are dropped too.
+    """
+    _watchers.append((tuple(classes), callback))
+
+
+def _changed_objects(session):
+    for objects in (session.new, session.dirty, session.deleted):
+        for obj in objects:
+            yield obj
+
+
+def notify(session, objects):
+    """
+    Call watchers of changed `objects` of `session`. Called after flush and
+    by bulk operations which don't flush.
+    """
+    if not _watchers:
+        return
+    for classes, callback in _watchers:
+        changes = [(obj.__class__,
+                    attributes.instance_state(obj).dict.get('id'))
+                   for obj in objects if isinstance(obj, classes)]
+        if not changes:
+            continue
+        callback(changes)
+        session.info.setdefault(PENDING_KEY, []).append((callback, changes))
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    if _watchers:
+        notify(session, list(_changed_objects(session)))
+
+
+def _transaction_end(session):
+    for callback, changes in session.info.pop(PENDING_KEY, []):
+        try:
+            callback(changes)
+        except Exception as e:
+            logger.exception(e)
+
+event.listen(Session, 'after_commit', _transaction_end)
+event.listen(Session, 'after_rollback', _transaction_end)
@@ -0,0 +1,84 @@
+# encoding: utf-8
+
+"""
+Database connection pool with statistics
+"""
+
+from sqlalchemy import exc, event
+from sqlalchemy.pool import QueuePool
+
+import threading
+import time
+
+import logging
+logger = logging.getLogger('dbconnection')
+
+
+class RenkiQueuePool(QueuePool):
+    """
+    QueuePool which keeps count of checkout waits and timeouts
+    """
+    def __init__(self, *args, **kwargs):
+        QueuePool.__init__(self, *args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._timeouts = 0
+
+    def _do_get(self):
+        begin = time.time()
+        try:
+            return QueuePool._do_get(self)
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            logger.error("Connection pool exhausted: %s" % self.status())
+            raise
+        finally:
+            waited = time.time() - begin
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_time += waited
+                self._max_wait_time = max(self._max_wait_time, waited)
+
+    def stats(self):
+        """
+        Return pool statistics as dict
+        """
+        with self._stats_lock:
+            return {
+                'size': self.size(),
+                'checked_in': self.checkedin(),
+                'checked_out': self.checkedout(),
+                'overflow': self.overflow(),
+                'max_overflow': self._max_overflow,
+                'checkouts': self._checkouts,
+                'wait_time': self._wait_time,
+                'max_wait_time': self._max_wait_time,
+                'timeouts': self._timeouts,
+            }
+
+
+def ping_connection(dbapi_connection, connection_record, connection_proxy):
+    """
+    Test connection on checkout, dead connections are replaced by pool
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    except Exception as e:
+        logger.warning("Discarding dead database connection: %s" % e)
+        raise exc.DisconnectionError()
+    finally:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+def enable_pre_ping(engine):
+    """
+    Ping connections of engine `engine` before they are given out
+    """
+    event.listen(engine, 'checkout', ping_connection)
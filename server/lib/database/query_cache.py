@@ -0,0 +1,112 @@
+# encoding: utf-8
+
+"""
+Cached queries
+
+Hot lookups are built once as statements with bound parameters and compiled
+once per database dialect, so each call only binds parameters and runs the
+statement.
+"""
+
+from lib.database.connection import session as dbsession
+from lib import stats
+
+from sqlalchemy.orm import Query
+import threading
+
+# Compiled forms kept per query, one per dialect and parameter set
+MAX_COMPILED = 16
+
+_queries = {}
+_lock = threading.Lock()
+
+
+class CompiledCache(dict):
+    """
+    Cache of compiled statements used as compiled_cache execution option,
+    keeps count of hits and misses. Cache is shared by all threads.
+    """
+    def __init__(self, size=MAX_COMPILED):
+        dict.__init__(self)
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def get(self, key, default=None):
+        value = dict.get(self, key, default)
+        if value is not default:
+            with self._lock:
+                self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self.misses += 1
+            if len(self) >= self.size:
+                self.clear()
+            dict.__setitem__(self, key, value)
+
+    def stats(self):
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self)
+        lookups = hits + misses
+        return {'hits': hits, 'misses': misses, 'size': size,
+                'hit_rate': float(hits) / lookups if lookups else None}
+
+
+class CachedQuery(object):
+    """
+    Query of one shape which is built on first use and compiled once.
+
+    @param name: Name used in statistics
+    @param entity: Mapped class loaded by query
+    @param build: Function returning Query of `entity`, values are given as
+                  bindparam() placeholders
+
+    Example:
+    >>> by_id = CachedQuery('domain_by_id', DomainDatabase,
+    ...     lambda q: q.filter(DomainDatabase.id == bindparam('id')))
+    >>> by_id(id=1).one()
+    """
+    def __init__(self, name, entity, build):
+        self.name = name
+        self.entity = entity
+        self._build = build
+        self._statement = None
+        self.cache = CompiledCache()
+        with _lock:
+            _queries[name] = self
+
+    @property
+    def statement(self):
+        if self._statement is None:
+            # Labeled statement is used as is by Query.from_statement(),
+            # otherwise labels are applied to new copy on every call and
+            # compiled form isn't found from cache
+            query = self._build(Query(self.entity))
+            self._statement = query.with_labels().statement
+        return self._statement
+
+    def __call__(self, **params):
+        """
+        Return query with parameters `params` bound
+        """
+        return dbsession.query(self.entity).from_statement(
+                    self.statement).params(**params).execution_options(
+                    compiled_cache=self.cache)
+
+
+def get_stats():
+    with _lock:
+        queries = list(_queries.values())
+    return dict((query.name, query.cache.stats()) for query in queries)
+
+
+stats.register('query_cache', get_stats)
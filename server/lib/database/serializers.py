@@ -0,0 +1,87 @@
+# encoding: utf-8
+
+"""
+Compiled serializers for mapped classes
+
+Serializer is built once per mapped class from its mapper, so converting
+object to dict is a single pass over precomputed columns and converters.
+"""
+
+from sqlalchemy import DateTime, Date, Time
+from sqlalchemy.orm import class_mapper
+
+from operator import attrgetter
+import threading
+
+# Columns which are never serialized
+EXCLUDED = ('deleted',)
+
+_serializers = {}
+_lock = threading.Lock()
+
+
+def _to_str(value):
+    return str(value)
+
+
+def _converter(column):
+    if isinstance(column.type, (DateTime, Date, Time)):
+        return _to_str
+    return None
+
+
+class Serializer(object):
+    """
+    Convert objects of one mapped class, or result rows containing its
+    columns, to dicts
+    """
+    def __init__(self, mapper, exclude=EXCLUDED):
+        self.keys = []
+        self.columns = []
+        self.converters = []
+        for prop in mapper.column_attrs:
+            if prop.key in exclude:
+                continue
+            self.keys.append(prop.key)
+            self.columns.append(getattr(mapper.class_, prop.key))
+            self.converters.append(_converter(prop.columns[0]))
+        self._fields = list(zip(range(len(self.keys)), self.keys,
+                                self.converters))
+        self._getter = attrgetter(*self.keys)
+
+    def from_values(self, values):
+        ret = {}
+        for i, key, convert in self._fields:
+            value = values[i]
+            if convert is not None and value is not None:
+                value = convert(value)
+            ret[key] = value
+        return ret
+
+    def __call__(self, obj):
+        values = self._getter(obj)
+        if len(self.keys) == 1:
+            values = (values,)
+        return self.from_values(values)
+
+    def project(self, query):
+        """
+        Run `query` selecting only serialized columns and return rows as
+        dicts without loading ORM objects
+        """
+        return [self.from_values(row)
+                for row in query.with_entities(*self.columns)]
+
+
+def get_serializer(cls):
+    """
+    Get serializer of mapped class `cls`
+    """
+    try:
+        return _serializers[cls]
+    except KeyError:
+        pass
+    with _lock:
+        if cls not in _serializers:
+            _serializers[cls] = Serializer(class_mapper(cls))
+        return _serializers[cls]
@@ -0,0 +1,132 @@
+# encoding: utf-8
+
+"""
+Streaming JSON responses
+
+Large listings are read with server side cursor and written to client in
+chunks, so memory usage is bounded by chunk size and first bytes are sent
+before whole result is read.
+
+Read-only requests use autocommit sessions, but PostgreSQL server side
+cursors work only inside transaction, so streamed statements are run on own
+connection in read-only transaction. Connection is returned to pool when
+stream ends.
+"""
+
+from bottle import response
+from lib.utils import ok
+from lib.database.connection import session as dbsession
+from lib.database.serializers import get_serializer
+from lib import renki_settings as settings
+
+from contextlib import contextmanager
+import json
+
+import logging
+logger = logging.getLogger('dbconnection')
+
+
+def stream_items(key, items, data=None, chunk_size=None):
+    """
+    Stream dicts from iterable `items` as JSON object
+    {"status": "OK", key: [...]}
+
+    @param data: Other fields of response
+    """
+    if chunk_size is None:
+        chunk_size = settings.STREAM_CHUNK_SIZE
+    head = json.dumps(ok(dict(data or {})))
+    response.content_type = 'application/json'
+
+    def generate():
+        yield '%s, %s: [' % (head[:-1], json.dumps(key))
+        chunk = []
+        first = True
+        try:
+            for item in items:
+                chunk.append(json.dumps(item))
+                if len(chunk) >= chunk_size:
+                    yield ('' if first else ',') + ','.join(chunk)
+                    first = False
+                    chunk = []
+            if chunk:
+                yield ('' if first else ',') + ','.join(chunk)
+        except Exception as e:
+            # Status is already sent, client gets truncated response
+            logger.exception(e)
+            raise
+        finally:
+            # Release cursor also when client disconnects
+            if hasattr(items, 'close'):
+                items.close()
+        yield ']}'
+    return generate()
+
+
+@contextmanager
+def stream_connection(bind):
+    """
+    Connection of engine `bind` with read-only transaction, transaction is
+    rolled back and connection closed on exit
+    """
+    connection = bind.connect()
+    try:
+        if connection.get_execution_options().get(
+                'isolation_level') == 'AUTOCOMMIT':
+            connection = connection.execution_options(
+                isolation_level=connection.default_isolation_level)
+        transaction = connection.begin()
+        try:
+            if connection.dialect.name == 'postgresql':
+                connection.execute("SET TRANSACTION READ ONLY")
+            yield connection
+        finally:
+            transaction.rollback()
+    finally:
+        connection.close()
+
+
+def stream_rows(key, statement, convert=dict, bind=None, data=None,
+                chunk_size=None):
+    """
+    Stream rows of SQL statement `statement` as JSON object
+    {"status": "OK", key: [...]}
+
+    @param convert: Function converting row to dict
+    @param bind: Engine statement is run with, defaults to engine of
+                 current session
+    @param data: Other fields of response
+    """
+    if chunk_size is None:
+        chunk_size = settings.STREAM_CHUNK_SIZE
+    if bind is None:
+        bind = dbsession.session().get_bind()
+    statement = statement.execution_options(stream_results=True)
+
+    def rows():
+        with stream_connection(bind) as connection:
+            result = connection.execute(statement)
+            while True:
+                chunk = result.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                for row in chunk:
+                    yield convert(row)
+    return stream_items(key, rows(), data=data, chunk_size=chunk_size)
+
+
+def stream_list(key, query, cls=None, data=None, chunk_size=None):
+    """
+    Stream rows of `query` as JSON object {"status": "OK", key: [...]}
+
+    @param cls: Mapped class used to serialize rows, defaults to entity of
+                query
+    @param data: Other fields of response
+    """
+    if cls is None:
+        cls = query.column_descriptions[0]['entity']
+    serializer = get_serializer(cls)
+    query = query.with_entities(*serializer.columns)
+    return stream_rows(key, query.statement, convert=serializer.from_values,
+                       bind=query.session.get_bind(), data=data,
+                       chunk_size=chunk_size)
@@ -3,10 +3,14 @@
 from lib.exceptions import Invalid, DoesNotExist, DatabaseError
 from lib.database.connection import session as dbsession
 from lib.database.tables import metadata
+from lib.database.serializers import get_serializer
+from lib.database import invalidation
 from sqlalchemy.ext.declarative import declarative_base
 
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy import text
+from sqlalchemy.orm import class_mapper, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 
@@ -22,8 +26,19 @@ class RenkiTable(object):
     def query(cls):
         return dbsession.query(cls)
 
+    @classmethod
+    def report_query(cls):
+        """
+        Query for reports and listings which may use read replica
+        """
+        return dbsession.report_query(cls)
+
     @classmethod
     def get(cls, id_):
+        """
+        Get object by primary key, objects already loaded to session are
+        returned without query.
+        """
         if id_:
             try:
                 id_ = int(id_)
@@ -31,17 +46,54 @@ class RenkiTable(object):
                 logger.error("Get with invalid database id %s" % id_)
                 raise Invalid('ID must be integer')
             try:
-                c = dbsession.query(cls).filter(
-                    cls.id==id_).one()
-            except NoResultFound:
-                raise DoesNotExist('Object with id %d does not exist' %
-                                   id_)
+                c = dbsession.query(cls).get(id_)
             except SQLAlchemyError as e:
                 logger.exception(e)
                 raise DatabaseError('Cannot get object with id %d' % id_)
+            if c is None:
+                raise DoesNotExist('Object with id %d does not exist' %
+                                   id_)
             return c
         raise Invalid('ID must be integer')
 
+    @classmethod
+    def get_many(cls, ids):
+        """
+        Get objects with ids `ids` using one query. Objects already loaded
+        to session are not queried again.
+
+        returns list of objects in same order as `ids`
+        @raises DoesNotExist if some ids don't exist, missing ids are in
+        exception attribute `missing`
+        """
+        try:
+            ids = [int(i) for i in ids]
+        except (TypeError, ValueError):
+            logger.error("Get with invalid database ids %s" % ids)
+            raise Invalid('ID must be integer')
+        ses = dbsession.session()
+        objects = {}
+        for id_ in ids:
+            obj = ses.identity_map.get(identity_key(cls, id_))
+            if obj is not None:
+                objects[id_] = obj
+        unknown = set(ids) - set(objects)
+        if unknown:
+            try:
+                for obj in dbsession.query(cls).filter(
+                        cls.id.in_(unknown)).all():
+                    objects[obj.id] = obj
+            except SQLAlchemyError as e:
+                logger.exception(e)
+                raise DatabaseError('Cannot get objects')
+        missing = sorted(set(ids) - set(objects))
+        if missing:
+            e = DoesNotExist('Objects with ids %s do not exist' %
+                             ', '.join([str(i) for i in missing]))
+            e.missing = missing
+            raise e
+        return [objects[i] for i in ids]
+
     def validate(self):
         """
         Validate this object
@@ -68,31 +120,108 @@ class RenkiTable(object):
             dbsession.save_commit()
         return True
 
-    def as_dict(self):
+    @classmethod
+    def serializer(cls):
         """
-        Return this object columns as dict object
+        Compiled serializer of this class
+        """
+        return get_serializer(cls)
+
+    @classmethod
+    def as_dicts(cls, query):
         """
-        ret = {}
-        for i in self.__table__.columns.keys():
-            if getattr(self, i).__class__.__name__ in ['datetime']:
-                ret[i] = str(getattr(self, i))
-            elif i not in ['deleted']:
-                ret[i] = getattr(self, i)
-        return ret
+        Return rows of `query` as dicts without loading objects
+        """
+        return get_serializer(cls).project(query)
 
-    # Variation of as_dict mainly to work with automagic history tables which don't have __table__
-    def to_dict(self):
+    @classmethod
+    def _allocate_ids(cls, ses, count):
+        """
+        Reserve `count` ids from table id sequence with one query
+        returns list of ids or None if database doesn't have sequences
+        """
+        if ses.get_bind().dialect.name != 'postgresql':
+            return None
+        seq = '%s_id_seq' % cls.__table__.name
+        result = ses.execute(text("SELECT nextval(:seq) FROM "
+                                  "generate_series(1, :count)"),
+                             {'seq': seq, 'count': count})
+        return [row[0] for row in result]
+
+    @classmethod
+    def save_many(cls, objects, commit=False):
+        """
+        Insert new objects `objects` using one executemany.
+
+        Objects are validated first, ids are reserved from table sequence
+        and rows are inserted without ORM unit of work. Inserted objects are
+        attached to session as if loaded from database.
+
+        Note: flush events are not fired for inserted objects, cache
+        invalidation watchers are notified directly.
+        """
+        objects = list(objects)
+        if not objects:
+            return objects
+        for obj in objects:
+            if not isinstance(obj, cls):
+                raise Invalid('Cannot save %s as %s' % (type(obj).__name__,
+                                                        cls.__name__))
+            obj.validate()
+        ses = dbsession.session()
+        for obj in objects:
+            if obj in ses:
+                ses.expunge(obj)
+        # Rows referenced by objects must exist before insert
+        ses.flush()
+        props = class_mapper(cls).column_attrs
+        ids = cls._allocate_ids(ses, len(objects))
+        rows = []
+        for n, obj in enumerate(objects):
+            if ids is not None and obj.id is None:
+                obj.id = ids[n]
+            row = {}
+            for prop in props:
+                column = prop.columns[0]
+                value = getattr(obj, prop.key)
+                default = column.default
+                if value is None and default is not None:
+                    if default.is_callable:
+                        value = default.arg(None)
+                    elif default.is_scalar:
+                        value = default.arg
+                    setattr(obj, prop.key, value)
+                if value is None and column.primary_key:
+                    continue
+                row[column.key] = value
+            rows.append(row)
+        try:
+            if ids is not None:
+                ses.execute(cls.__table__.insert(), rows)
+            else:
+                for obj, row in zip(objects, rows):
+                    result = ses.execute(cls.__table__.insert(), row)
+                    obj.id = result.inserted_primary_key[0]
+        except SQLAlchemyError as e:
+            logger.exception(e)
+            raise DatabaseError('Cannot save objects')
+        for obj in objects:
+            make_transient_to_detached(obj)
+            ses.add(obj)
+        invalidation.notify(ses, objects)
+        if commit is True:
+            dbsession.safe_commit()
+        return objects
+
+    def as_dict(self):
         """
         Return this object columns as dict object
         """
-        ret = {}
-        for i in vars(self):
-            if i[0] != '_':
-                if getattr(self, i).__class__.__name__ in ['datetime']:
-                    ret[i] = str(getattr(self, i))
-                elif i not in ['deleted']:
-                    ret[i] = getattr(self, i)
-        return ret
+        return get_serializer(type(self))(self)
+
+    # Serializer works also with automagic history tables which don't have
+    # __table__
+    to_dict = as_dict
 
 class RenkiDataTable(RenkiTable):
     # Every data table have comment, deleted and timestamp columns
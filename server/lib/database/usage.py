@@ -0,0 +1,275 @@
+# encoding: utf-8
+
+"""
+Usage counters
+
+Number of rows each user has in each user data table is kept in
+usage_counters table, so quota checks don't need to count rows. Counters are
+updated when objects are flushed and reconciled periodically against real
+row counts.
+"""
+
+from lib.database.table import RenkiTable, RenkiBase
+from lib.database.tables import register_table, TABLES
+from lib.database.connection import session as dbsession
+from lib.auth.db import Limits, DefaultLimits
+from lib.exceptions import Stopped
+from lib.threads import RenkiThread
+from lib import renki_settings as settings
+
+from collections import defaultdict
+from sqlalchemy import Column, Unicode, Integer, ForeignKey, \
+    UniqueConstraint, and_, func, select, event, literal, cast, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, attributes
+
+import logging
+logger = logging.getLogger('dbconnection')
+
+
+class UsageCounters(RenkiBase, RenkiTable):
+    """
+    Number of rows of user `user_id` in table `table`
+    """
+    __tablename__ = 'usage_counters'
+    user_id = Column('user_id', Integer, ForeignKey('users.id'),
+                     nullable=False)
+    table = Column('table', Unicode, nullable=False)
+    count = Column('count', Integer, nullable=False, default=0)
+    __table_args__ = (UniqueConstraint('user_id', 'table'),)
+
+    def validate(self):
+        return True
+
+register_table(UsageCounters)
+
+
+def is_counted(cls):
+    """
+    Returns True if rows of mapped class `cls` are counted per user.
+    History classes of versioned tables are not counted.
+    """
+    return hasattr(cls, '__history_mapper__') and \
+        'user_id' in getattr(cls, '__table__').c
+
+
+def counted_tables():
+    return [table for table in TABLES if is_counted(table)]
+
+
+def _counter_filter(cls, user_id):
+    counters = UsageCounters.__table__
+    return and_(counters.c.user_id == user_id,
+                counters.c.table == cls.__tablename__)
+
+
+def _count_rows(connection, cls, user_id):
+    table = cls.__table__
+    return connection.execute(select([func.count()]).select_from(table).where(
+                              table.c.user_id == user_id)).scalar()
+
+
+def _increment(connection, cls, user_id, delta):
+    counters = UsageCounters.__table__
+    result = connection.execute(counters.update().where(
+                _counter_filter(cls, user_id)).values(
+                count=counters.c.count + delta))
+    return result.rowcount > 0
+
+
+def add_usage(connection, deltas):
+    """
+    Add usage changes `deltas` to counters
+
+    @param deltas: dict of (class, user id) -> change of row count
+    """
+    counters = UsageCounters.__table__
+    for (cls, user_id), delta in deltas.items():
+        if not delta or user_id is None:
+            continue
+        if _increment(connection, cls, user_id, delta):
+            continue
+        # First change of user in this table, rows written in this
+        # transaction are already counted
+        count = _count_rows(connection, cls, user_id)
+        try:
+            with connection.begin_nested():
+                connection.execute(counters.insert(), user_id=user_id,
+                                   table=cls.__tablename__, count=count)
+        except IntegrityError:
+            # Counter was created by concurrent transaction, which didn't
+            # see rows of this transaction
+            _increment(connection, cls, user_id, delta)
+
+
+def usage_deltas(added=(), deleted=()):
+    """
+    Changes of row counts when objects `added` are inserted and objects
+    `deleted` are deleted
+    """
+    deltas = defaultdict(int)
+    for obj in added:
+        deltas[(type(obj), obj.user_id)] += 1
+    for obj in deleted:
+        deltas[(type(obj), obj.user_id)] -= 1
+    return deltas
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    deltas = usage_deltas(
+                [obj for obj in session.new if is_counted(type(obj))],
+                [obj for obj in session.deleted if is_counted(type(obj))])
+    for obj in session.dirty:
+        if not is_counted(type(obj)):
+            continue
+        # Object moved to other user
+        history = attributes.get_history(obj, 'user_id')
+        if history.added and history.deleted:
+            deltas[(type(obj), history.deleted[0])] -= 1
+            deltas[(type(obj), history.added[0])] += 1
+    if any(deltas.values()):
+        add_usage(session.connection(), deltas)
+
+
+def get_usage(cls, user_id):
+    """
+    Get number of rows user `user_id` has in table of class `cls`
+    """
+    count = dbsession.query(UsageCounters.count).filter(
+                UsageCounters.user_id == user_id,
+                UsageCounters.table == cls.__tablename__).scalar()
+    if count is None:
+        # User hasn't added anything since counters were introduced
+        count = cls.query().filter(cls.user_id == user_id).count()
+    return count
+
+
+def usage_report(classes=None):
+    """
+    Statement returning usage of every user in every counted table with
+    effective limits. Rows are counted with one grouped query per table
+    combined with UNION ALL, so report costs one statement.
+
+    Columns: user_id, table, count, soft_limit, hard_limit
+    """
+    if classes is None:
+        classes = counted_tables()
+    counts = []
+    for cls in classes:
+        table = cls.__table__
+        counts.append(select([
+            table.c.user_id.label('user_id'),
+            cast(literal(cls.__tablename__), Unicode).label('table'),
+            func.count().label('count'),
+            # Limits defined in class are used if table has no limits
+            cast(literal(cls.soft_limit), Integer).label('soft_limit'),
+            cast(literal(cls.hard_limit), Integer).label('hard_limit'),
+            ]).group_by(table.c.user_id))
+    usage = union_all(*counts).alias('usage')
+    # Limits tables may have duplicate rows, strictest limit is used like
+    # in lib.auth.db.combine_limits
+    limits = Limits.__table__
+    user_limits = select([
+        limits.c.users_id, limits.c.table,
+        func.min(limits.c.soft_limit).label('soft_limit'),
+        func.min(limits.c.hard_limit).label('hard_limit'),
+        ]).group_by(limits.c.users_id, limits.c.table).alias('user_limits')
+    defaults = DefaultLimits.__table__
+    default_limits = select([
+        defaults.c.table,
+        func.min(defaults.c.soft_limit).label('soft_limit'),
+        func.min(defaults.c.hard_limit).label('hard_limit'),
+        ]).group_by(defaults.c.table).alias('default_limits')
+    joined = usage.outerjoin(user_limits, and_(
+                    user_limits.c.users_id == usage.c.user_id,
+                    user_limits.c.table == usage.c.table)).outerjoin(
+                default_limits, default_limits.c.table == usage.c.table)
+    return select([
+        usage.c.user_id, usage.c.table, usage.c.count,
+        func.coalesce(user_limits.c.soft_limit, default_limits.c.soft_limit,
+                      usage.c.soft_limit).label('soft_limit'),
+        func.coalesce(user_limits.c.hard_limit, default_limits.c.hard_limit,
+                      usage.c.hard_limit).label('hard_limit'),
+        ]).select_from(joined).order_by(usage.c.user_id, usage.c.table)
+
+
+def _locked_counters(cls):
+    counters = UsageCounters.__table__
+    return select([counters.c.user_id, counters.c.count]).where(
+                counters.c.table == cls.__tablename__).with_for_update()
+
+
+def reconcile(classes=None):
+    """
+    Fix counters which differ from real row counts
+
+    Counters of table are locked before rows are counted, so increments of
+    concurrent transactions wait and are added to fixed counts instead of
+    being overwritten. Every table is committed separately to keep locks
+    short.
+
+    @returns Number of fixed counters
+    """
+    if classes is None:
+        classes = counted_tables()
+    counters = UsageCounters.__table__
+    fixed = 0
+    for cls in classes:
+        connection = dbsession.session().connection()
+        table = cls.__table__
+        stored = dict(connection.execute(_locked_counters(cls)).fetchall())
+        actual = dict(connection.execute(
+                    select([table.c.user_id, func.count()]).group_by(
+                    table.c.user_id)).fetchall())
+        for user_id in set(actual) | set(stored):
+            count = actual.get(user_id, 0)
+            if stored.get(user_id) == count:
+                continue
+            fixed += 1
+            logger.info("Usage of user %s in %s is %s, counter was %s"
+                        % (user_id, cls.__tablename__, count,
+                           stored.get(user_id)))
+            if user_id in stored:
+                connection.execute(counters.update().where(
+                    _counter_filter(cls, user_id)).values(count=count))
+                continue
+            try:
+                with connection.begin_nested():
+                    connection.execute(counters.insert(), user_id=user_id,
+                                       table=cls.__tablename__, count=count)
+            except IntegrityError:
+                # Counter was created by concurrent transaction from row
+                # count which includes its own rows
+                pass
+        dbsession.commit()
+    return fixed
+
+
+class UsageReconciler(RenkiThread):
+    """
+    Reconcile usage counters every `interval` seconds
+    """
+    def __init__(self, interval=None):
+        RenkiThread.__init__(self)
+        self.daemon = True
+        if interval is None:
+            interval = settings.USAGE_RECONCILE_INTERVAL
+        self.interval = interval
+
+    def reconcile(self):
+        try:
+            fixed = reconcile()
+            if fixed:
+                logger.warning("Fixed %d usage counters" % fixed)
+        except Exception as e:
+            logger.exception(e)
+            dbsession.rollback()
+
+    def run(self):
+        while not self.is_stopped():
+            try:
+                self.safe_wait(self.interval)
+            except Stopped:
+                break
+            self.reconcile()
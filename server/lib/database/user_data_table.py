@@ -1,19 +1,24 @@
 from lib.database.connection import session as dbsession
 from lib.history_meta import Versioned
-from sqlalchemy.orm import relationship
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.orm import relationship, object_session, Session
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, \
+    event
 from lib.database.table import RenkiDataTable
 from sqlalchemy.ext.declarative import declared_attr
 from lib.communication.ticket_tables import TicketGroupDatabase
-from lib.communication.ticket import create_ticket, create_delete_ticket
+from lib.communication.ticket import check_ticket, add_ticket, \
+    write_tickets, discard_tickets
 from lib.exceptions import Invalid, SoftLimitReached, HardLimitReached
-from lib.auth.db import Limits, DefaultLimits
+from lib.auth.db import Users, get_default_limits, get_user_limits
+from lib.database.usage import add_usage, usage_deltas, get_usage
+
+from collections import defaultdict
 
 class RenkiUserDataTable(RenkiDataTable, Versioned):
     @declared_attr
     def user_id(cls):
-        return Column('user_id', Integer, ForeignKey("users.id"), nullable=False)
+        return Column('user_id', Integer, ForeignKey("users.id"), nullable=False,
+                      index=True)
 
     waiting = Column('waiting', Boolean, nullable=False, default=False)
 
@@ -32,15 +37,65 @@ class RenkiUserDataTable(RenkiDataTable, Versioned):
         return RenkiDataTable.save(self, commit)
 
     def save(self, commit=False):
+        # Tickets are created when object is flushed, errors are raised here
         if not self.waiting:
-            create_ticket(self)
+            check_ticket(self)
         return RenkiDataTable.save(self, commit)
 
+    @classmethod
+    def save_many(cls, objects, commit=False, user=None):
+        """
+        Insert objects `objects` in bulk. Tickets of all objects are created
+        to one ticket group, like tickets of objects saved in one flush.
+
+        Quota is checked only if `user` is given: every owner must have room
+        for all of its new objects, unless `user` has pass_limits
+        permission.
+
+        @raises DoesNotExist: if owner of some object doesn't exist
+        """
+        objects = list(objects)
+        # Owners of whole batch are resolved with one query
+        Users.get_many(sorted(set(obj.user_id for obj in objects)))
+        if user is not None:
+            counts = defaultdict(int)
+            for obj in objects:
+                counts[obj.user_id] += 1
+            for user_id, count in counts.items():
+                cls.validate_add(user, user_id, count)
+        ticketed = [obj for obj in objects if not obj.waiting]
+        for obj in ticketed:
+            check_ticket(obj)
+        ses = dbsession.session()
+        # Flush earlier changes first, their tickets belong to own group
+        for obj in objects:
+            if obj in ses:
+                ses.expunge(obj)
+        ses.flush()
+        connection = ses.connection()
+        try:
+            for obj in ticketed:
+                ticket_group_id = add_ticket(connection, obj, "new",
+                                             session=ses)
+                if ticket_group_id is not None:
+                    obj.ticket_group_id = ticket_group_id
+            objects = super(RenkiUserDataTable, cls).save_many(objects)
+            # Bulk insert bypasses flush, which updates usage counters and
+            # writes tickets
+            add_usage(connection, usage_deltas(objects))
+            write_tickets(ses)
+        except:
+            discard_tickets(ses)
+            raise
+        if commit is True:
+            dbsession.safe_commit()
+        return objects
+
     def delete(self):
         """
         Delete this object from database
         """
-        create_delete_ticket(self)
+        check_ticket(self)
         return RenkiDataTable.delete(self)
 
     # Needs to be overwritten for tables that don't have service_group_id
@@ -52,34 +107,77 @@ class RenkiUserDataTable(RenkiDataTable, Versioned):
 
     @classmethod
     def get_limits_for_user(cls, user_id):
-        limits = {'soft_limit' : cls.soft_limit, 'hard_limit' : cls.hard_limit}
-
-        try:
-            defaultLimit = DefaultLimits.query().filter(DefaultLimits.table == cls.__tablename__).one()
-            limits = {'soft_limit' : defaultLimit.soft_limit, 'hard_limit' : defaultLimit.hard_limit}
-        except NoResultFound:
-            pass
-
-        try:
-            limit = Limits.query().filter(Limits.table == cls.__tablename__ and Limits.user_id == user_id).one()
-            limits = {'soft_limit' : limit.soft_limit, 'hard_limit' : limit.hard_limit}
-        except NoResultFound:
-            pass
-
-        return limits
+        # Limits are resolved per limit like in usage report: user's own
+        # limit, default limit and limit of class
+        user_limits = get_user_limits(user_id, cls.__tablename__) or \
+            (None, None)
+        default_limits = get_default_limits(cls.__tablename__) or \
+            (None, None)
+        limits = [next((l for l in values if l is not None), None)
+                  for values in zip(user_limits, default_limits,
+                                    (cls.soft_limit, cls.hard_limit))]
+        return {'soft_limit' : limits[0], 'hard_limit' : limits[1]}
 
     @classmethod
     def count_user_entries(cls, user_id):
-        return cls.query().filter(cls.user_id == user_id).count()
+        return get_usage(cls, user_id)
 
     @classmethod
-    def validate_add(cls, user, user_id):
+    def validate_add(cls, user, user_id, count=1):
+        """
+        Check that user `user_id` can add `count` new objects
+        """
         if (user.has_permission('pass_limits')):
             return
 
         limits = cls.get_limits_for_user(user_id)
-        entries = cls.count_user_entries(user_id)
+        entries = cls.count_user_entries(user_id) + count - 1
         if entries >= limits['hard_limit']:
             raise HardLimitReached("Hard limit for ports reached")
         elif entries >= limits['soft_limit']:
             raise SoftLimitReached("Soft limit for ports reached")
+
+
+
+def _ticketed(obj):
+    # History objects of versioned tables don't get tickets
+    return hasattr(type(obj), '__history_mapper__') and not obj.waiting
+
+
+# Mapper events are used instead of before_flush, because listener which
+# versioned_session() adds to sessionmaker hides before_flush listeners of
+# Session class
+@event.listens_for(RenkiUserDataTable, 'before_insert', propagate=True)
+def _before_insert(mapper, connection, target):
+    if _ticketed(target):
+        ticket_group_id = add_ticket(connection, target, "new")
+        if ticket_group_id is not None:
+            target.ticket_group_id = ticket_group_id
+
+
+@event.listens_for(RenkiUserDataTable, 'before_update', propagate=True)
+def _before_update(mapper, connection, target):
+    # before_update is called also for objects without changed columns
+    if _ticketed(target) and object_session(target).is_modified(
+            target, include_collections=False):
+        ticket_group_id = add_ticket(connection, target, "old")
+        if ticket_group_id is not None:
+            target.ticket_group_id = ticket_group_id
+
+
+@event.listens_for(RenkiUserDataTable, 'before_delete', propagate=True)
+def _before_delete(mapper, connection, target):
+    if hasattr(type(target), '__history_mapper__'):
+        add_ticket(connection, target, str(target.as_dict()), "deleted")
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    write_tickets(session)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _after_soft_rollback(session, previous_transaction):
+    # Failed flush rolls back its subtransaction, so this is called also when
+    # flush fails and the session isn't rolled back yet
+    discard_tickets(session)
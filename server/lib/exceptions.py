@@ -45,6 +45,11 @@ class DoesNotExist(RenkiHTTPError):
     pass
 
 
+class RequestTimeout(RenkiHTTPError):
+    STATUS = 500
+    pass
+
+
 class AuthenticationFailed(RenkiHTTPError):
     STATUS = 401
     pass
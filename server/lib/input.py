@@ -177,9 +177,32 @@ class StringValidator(Validator):
         raise Invalid('"%s" is not valid string' % value)
 
 
+class BooleanValidator(Validator):
+    TRUE = ['1', 'true', 'yes']
+    FALSE = ['0', 'false', 'no']
+
+    def cast(self, value):
+        if isinstance(value, bool):
+            return value
+        elif isinstance(value, str):
+            if value.lower() in self.TRUE:
+                return True
+            elif value.lower() in self.FALSE:
+                return False
+        raise Invalid("%s is not valid boolean" % value)
+
+
 class LimitedParser(InputParser):
-    limit = IntegerValidator('limit', default=None, required=False)
-    offset = IntegerValidator('offset', default=None, required=False)
+    limit = IntegerValidator('limit', positive=True, default=None,
+                             required=False)
+    # Deprecated, use cursor
+    offset = IntegerValidator('offset', positive=True, default=None,
+                              required=False)
+    cursor = StringValidator('cursor', default=None, required=False,
+                             length=1024,
+                             chars=string.ascii_letters + string.digits + '-_')
+    # Stream results as chunked JSON
+    stream = BooleanValidator('stream', default=False, required=False)
 
 
 class DomainValidator(StringValidator):
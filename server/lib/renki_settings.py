@@ -127,11 +127,36 @@ LOGGING = {
             'propagate': True,
             'level': 'DEBUG',
         },
+        'SignedAuthentication': {
+            'handlers': ['console'],
+            'propagate': True,
+            'level': 'DEBUG',
+        },
+        'sql': {
+            'handlers': ['console'],
+            'propagate': True,
+            'level': 'INFO',
+        },
+        'stats': {
+            'handlers': ['console'],
+            'propagate': True,
+            'level': 'INFO',
+        },
         'auth.db': {
             'handlers': ['console'],
             'propagate': True,
             'level': 'DEBUG',
         },
+        'auth.password': {
+            'handlers': ['console'],
+            'propagate': True,
+            'level': 'INFO',
+        },
+        'auth.purge': {
+            'handlers': ['console'],
+            'propagate': True,
+            'level': 'INFO',
+        },
         'utils': {
             'handlers': ['console'],
             'propagate': True,
@@ -195,6 +220,22 @@ DB_TEST_USER = 'renki'
 DB_TEST_PASSWORD = ''
 DB_TEST_SERVER = 'localhost'
 DB_TEST_PORT = 5432
+DB_POOL_SIZE = 5
+DB_POOL_MAX_OVERFLOW = 10
+DB_POOL_TIMEOUT = 10
+DB_POOL_RECYCLE = 3600
+DB_POOL_PRE_PING = False
+STATS_LOG_INTERVAL = 300
+DB_REPLICAS = []
+DB_REPLICA_PIN_SECONDS = 5
+DB_TRACE_TXID_SAMPLE = 0
+SQL_SLOW_QUERY_TIME = 0.5
+SQL_NPLUSONE_THRESHOLD = 5
+STREAM_CHUNK_SIZE = 500
+REQUEST_DEADLINE = 30
+USAGE_RECONCILE_INTERVAL = 3600
+SERVICE_TOPOLOGY_TTL = 60
+DB_TRACE_TXID_HEADER = 'X-Renki-Trace-Txid'
 RENKISRV_SOCKET_ADDRESS = '0.0.0.0'
 RENKISRV_SOCKET_PORT = 6552
 RENKISRV_SOCKET_SSL = True
@@ -203,3 +244,13 @@ RENKISRV_SOCKET_KEY = REQUIREDIF('RENKISRV_SOCKET_KEY', lambda x: x.RENKISRV_SOC
 RENKISRV_SOCKET_CA = None
 KEY_EXPIRE_TIME = 86400
 AUTH_SECRET = REQUIRED('AUTH_SECRET')
+AUTH_CACHE_SIZE = 10000
+AUTH_CACHE_TTL = 60
+SIGNED_KEY_EPOCH = 0
+DUMMY_AUTH_MAX_KEYS = 100000
+AUTH_KEY_PURGE_INTERVAL = 3600
+AUTH_KEY_PURGE_BATCH = 1000
+PASSWORD_HASHER = 'pbkdf2'
+PASSWORD_ITERATIONS = 100000
+PASSWORD_SCRYPT_N = 16384
+PASSWORD_HASH_WORKERS = 2
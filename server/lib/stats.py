@@ -0,0 +1,72 @@
+# encoding: utf-8
+
+"""
+Internal statistics
+
+Components register function returning their current statistics as dict,
+statistics are shown in admin route /stats and logged periodically.
+"""
+
+from lib.exceptions import Stopped
+from lib.threads import RenkiThread
+from lib import renki_settings as settings
+
+import threading
+
+import logging
+logger = logging.getLogger('stats')
+
+_sources = {}
+_lock = threading.Lock()
+
+
+def register(name, func):
+    """
+    Register statistics source `func` with name `name`
+
+    @param func: Function without arguments returning dict
+    """
+    with _lock:
+        _sources[name] = func
+
+
+def unregister(name):
+    with _lock:
+        _sources.pop(name, None)
+
+
+def collect():
+    """
+    Collect statistics from all registered sources
+    """
+    with _lock:
+        sources = list(_sources.items())
+    stats = {}
+    for name, func in sources:
+        try:
+            stats[name] = func()
+        except Exception as e:
+            logger.exception(e)
+            stats[name] = None
+    return stats
+
+
+class StatsLogger(RenkiThread):
+    """
+    Log collected statistics every `interval` seconds
+    """
+    def __init__(self, interval=None):
+        RenkiThread.__init__(self)
+        self.daemon = True
+        if interval is None:
+            interval = settings.STATS_LOG_INTERVAL
+        self.interval = interval
+
+    def run(self):
+        while not self.is_stopped():
+            try:
+                self.safe_wait(self.interval)
+            except Stopped:
+                break
+            for name, values in sorted(collect().items()):
+                logger.info("%s: %s" % (name, values))
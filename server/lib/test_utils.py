@@ -45,6 +45,9 @@ connection.initialize_connection(unittest=True)
 logging.config.dictConfig({'version': 1,
     'disable_existing_loggers': True})
 settings.DEBUG = True
+# Fast password hashing for tests
+settings.PASSWORD_HASH_WORKERS = 0
+settings.PASSWORD_ITERATIONS = 1000
 
 ### JSON validation ###
 
@@ -108,6 +111,12 @@ class JSONNumber(JSONValidatorObject):
 class JSONBoolean(JSONValidatorObject):
     TYPE = 'boolean'
 
+class JSONCursor(JSONValidatorObject):
+    """
+    Pagination cursor, null on last page
+    """
+    TYPE = ['string', 'null']
+
 #######################
 # Response validation #
 #######################
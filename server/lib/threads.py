@@ -31,6 +31,6 @@ class RenkiThread(threading.Thread):
         begin = time.time()
         end = begin + duration
         while time.time() < end:
-            sleep(0.1)
+            time.sleep(0.1)
             if self._stopped:
                 raise Stopped("Thread stopped")
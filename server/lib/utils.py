@@ -176,3 +176,17 @@ def sandbox(function, *args, **kwargs):
     except Exception as e:
         logger.exception(e)
         raise RenkiHTTPError('Unknown error occurred')
+
+def close_after(gen, stack):
+    """
+    Iterate generator `gen` and close ExitStack `stack` when iteration ends
+    or generator is closed. Used by plugins to keep request scope open while
+    streamed response is written.
+    """
+    with stack:
+        try:
+            for item in gen:
+                yield item
+        finally:
+            # Inner scopes are closed before `stack`
+            gen.close()
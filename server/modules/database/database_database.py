@@ -12,7 +12,8 @@ class DatabaseDatabase(RenkiBase, RenkiUserDataTable):
     __tablename__ = 'database'
 
     name = Column('name', String(512), nullable=False)
-    user_id = Column('user_id', Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column('user_id', Integer, ForeignKey("users.id"), nullable=False,
+                     index=True)
     type = Column('type', types.Enum('mysql', 'postgresql', name='database_types', native_enum=True), nullable=False)
     service_group_id = Column(Integer, ForeignKey('service_group.id'))
     service_group = relationship(ServiceGroupDatabase, backref="databases")
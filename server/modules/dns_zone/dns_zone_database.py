@@ -16,7 +16,8 @@ from lib.database.tables import register_table
 class DNSRecordDatabase(RenkiBase, RenkiUserDataTable):
     __tablename__ = 'dns_record'
 
-    dns_zone_id = Column('dns_zone_id', Integer, ForeignKey('dns_zone.id'))
+    dns_zone_id = Column('dns_zone_id', Integer, ForeignKey('dns_zone.id'),
+                         index=True)
 
     key = Column('key', String, nullable=False)
     type = Column('type', String, nullable=False)
@@ -33,7 +34,8 @@ class DNSRecordDatabase(RenkiBase, RenkiUserDataTable):
 
 class DNSZoneDatabase(RenkiBase, RenkiUserDataTable):
     __tablename__ = 'dns_zone'
-    domain_id   = Column('domain_id', Integer, ForeignKey('domain.id'))
+    domain_id   = Column('domain_id', Integer, ForeignKey('domain.id'),
+                         index=True)
 
     # SOA Properties
     refresh = Column('refresh', Integer, nullable=False,
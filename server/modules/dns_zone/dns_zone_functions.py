@@ -5,25 +5,33 @@ from modules.domain.domain_database import DomainDatabase
 
 from lib.exceptions import AlreadyExist, Invalid, DoesNotExist
 from lib.validators import is_positive_numeric
-from lib.database.filters import do_limits
 
 from modules.domain.domain_database import DomainDatabase
 
 from sqlalchemy.orm.exc import NoResultFound
 
 from lib.validators import is_positive_numeric
-from lib.database.filters import do_limits
+from lib.database.filters import paginate
+from lib.database.query_cache import CachedQuery
 
-def get_dns_zone(user_id, domain_id, limit=None, offset=None):
+from sqlalchemy import bindparam
+
+_dns_zone = CachedQuery('dns_zone', DNSZoneDatabase,
+    lambda q: q.filter(DNSZoneDatabase.domain_id == bindparam('domain_id'),
+                       DNSZoneDatabase.domain.has(
+                           DomainDatabase.user_id == bindparam('user_id'))))
+_dns_record = CachedQuery('dns_record', DNSRecordDatabase,
+    lambda q: q.filter(DNSRecordDatabase.id == bindparam('dns_record_id'),
+                       DNSRecordDatabase.dns_zone.has(
+                           DNSZoneDatabase.domain.has(
+                               DomainDatabase.user_id == bindparam('user_id')))))
+
+def get_dns_zone(user_id, domain_id):
     if is_positive_numeric(user_id) is not True:
         raise Invalid('User id must be positive integer')
     elif is_positive_numeric(domain_id) is not True:
         raise Invalid('User id must be positive integer')
-    zonequery = DNSZoneDatabase.query()
-    zonequery = zonequery.filter(DNSZoneDatabase.domain_id==domain_id)
-    zonequery = zonequery.filter(DNSZoneDatabase.domain.has(
-                                DomainDatabase.user_id==user_id))
-    zonequery = do_limits(zonequery, limit, offset)
+    zonequery = _dns_zone(domain_id=domain_id, user_id=user_id)
     try:
         return zonequery.one()
     except NoResultFound:
@@ -77,21 +85,21 @@ def delete_dns_zone(user_id, domain_id):
     zone.delete()
     return
 
-def get_dns_records(user_id, domain_id, offset=None, limit=None):
+def get_dns_records(user_id, domain_id, offset=None, limit=None, cursor=None,
+                    stream=False):
+    """
+    Get DNS records of domain `domain_id` as dicts, or query of records if
+    `stream` is True
+    """
     zone = get_dns_zone(user_id, domain_id)
     q = DNSRecordDatabase.query().filter(
             DNSRecordDatabase.dns_zone_id==zone.id)
-    q = do_limits(q, limit, offset)
-    return q.all()
+    return paginate(q, DNSRecordDatabase.id, limit=limit, cursor=cursor,
+                    offset=offset, fetch=DNSRecordDatabase.as_dicts,
+                    stream=stream)
 
 def get_dns_record(user_id, dns_record_id):
-    record = DNSRecordDatabase.query().filter(
-        DNSRecordDatabase.id==dns_record_id,
-        DNSRecordDatabase.dns_zone.has(
-        DNSZoneDatabase.domain.has(
-            DomainDatabase.user_id==user_id)
-        )
-    )
+    record = _dns_record(dns_record_id=dns_record_id, user_id=user_id)
     try:
         return record.one()
     except NoResultFound:
@@ -8,6 +8,7 @@ from bottle import request
 from lib.renki import app
 from lib.utils import ok, error, request_data, sandbox
 from lib.database import connection as dbconn
+from lib.database.streaming import stream_list
 from lib.auth.func import require_perm
 from .dns_zone_validators import DNSGetValidator, \
     DNSZoneValidator, DNSRecordParser, DNSRecordQueryValidator, \
@@ -28,7 +29,7 @@ def get_dns_route(user_id, domain_id):
     data = dict(request.params.items())
     data['user_id'] = user_id
     data['domain_id'] = domain_id
-    params = DNSGetValidator.parse(data)
+    params = DNSQueryValidator.parse(data)
     zone = sandbox(get_dns_zone, **params)
     dbconn.session.safe_commit()
     return ok(zone.as_dict())
@@ -125,7 +126,9 @@ def dns_zone_get_records(user_id, domain_id):
     data['domain_id'] = domain_id
     params = DNSGetValidator.parse(data)
     records = sandbox(get_dns_records, **params)
-    return ok({'records': [x.as_dict() for x in records]})
+    if params['stream']:
+        return stream_list('records', records, data={'next': None})
+    return ok({'records': records, 'next': records.next})
 
 
 @app.get('/domains/<domain_id:int>/dns/records')
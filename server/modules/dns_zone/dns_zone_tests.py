@@ -85,6 +85,11 @@ class TestDNSZoneRoutine(tu.BasicTest):
                      schema=dns_zone_schema())
         self.assertQ('/domains/1/dns/', user=u, status=tu.STATUS_OK,
                      schema=dns_zone_schema())
+        # Zone is single object, listing parameters are not accepted
+        self.assertQ('/domains/1/dns', user=u, status=tu.STATUS_ERROR,
+                     args={'stream': 'true'})
+        self.assertQ('/domains/1/dns', user=u, status=tu.STATUS_ERROR,
+                     args={'cursor': 'MQ'})
 
     def test_dns_zone_get_other_user(self):
         u = self.user('test', ['dns_zone_view_own', 'domains_modify_own',
@@ -159,7 +164,8 @@ class TestDNSRecordRoutine(tu.BasicTest):
 
     def test_dns_record_get_anon(self):
         u = self.create_user_domain_dns()
-        records_schema = [tu.JSONArray('records', minItems=0, maxItems=0)]
+        records_schema = [tu.JSONArray('records', minItems=0, maxItems=0),
+                          tu.JSONCursor('next')]
         self.assertQ('/domains/1/dns/records', user=u, status=tu.STATUS_OK,
                      schema=records_schema)
 
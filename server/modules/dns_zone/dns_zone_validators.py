@@ -2,7 +2,7 @@
 
 from lib.input import UserIDValidator, DomainValidator, InputParser, \
     IntegerValidator, StringValidator, ListValueValidator, IPv4Validator, \
-    IPv6Validator, ConditionalInputParser
+    IPv6Validator, ConditionalInputParser, LimitedParser
 import string
 from lib.exceptions import Invalid
 
@@ -79,11 +79,9 @@ class NSRecordValidator(DNSRecordValidator):
 
 # Route validators
 
-class DNSGetValidator(InputParser):
+class DNSGetValidator(LimitedParser):
     user_id = UserIDValidator('user_id')
     domain_id =  IntegerValidator('domain_id', positive=True, required=True)
-    limit = IntegerValidator('limit', positive=True, required=False)
-    offset = IntegerValidator('offset', positive=True, required=False)
 
 
 class DNSZoneValidator(InputParser):
@@ -13,7 +13,7 @@ from sqlalchemy.orm import relationship
 
 class DomainDatabase(RenkiBase, RenkiUserDataTable):
     __tablename__ = 'domain'
-    name = Column('name', String(1024), nullable=False)
+    name = Column('name', String(1024), nullable=False, index=True)
     dns_zone = relationship("DNSZoneDatabase", uselist=False,
                             backref="domain")
     user = relationship("Users", backref="domains")
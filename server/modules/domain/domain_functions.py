@@ -9,22 +9,32 @@ from .domain_database import DomainDatabase
 
 from lib.exceptions import AlreadyExist, Invalid, DoesNotExist
 from lib.validators import is_positive_numeric
-from lib.database.filters import do_limits
+from lib.database.filters import paginate
+from lib.database.query_cache import CachedQuery
 
+from sqlalchemy import bindparam
 from sqlalchemy.orm.exc import NoResultFound
 
+_domain_by_id = CachedQuery('domain_by_id', DomainDatabase,
+    lambda q: q.filter(DomainDatabase.id == bindparam('domain_id')))
+_user_domain_by_id = CachedQuery('user_domain_by_id', DomainDatabase,
+    lambda q: q.filter(DomainDatabase.id == bindparam('domain_id'),
+                       DomainDatabase.user_id == bindparam('user_id')))
 
-def get_domains(user_id=None, limit=None, offset=None):
+
+def get_domains(user_id=None, limit=None, offset=None, cursor=None,
+                stream=False):
     query =  DomainDatabase.query()
     if user_id is not None:
         if is_positive_numeric(user_id) is not True:
             raise Invalid('User id must be positive integer')
         query = query.filter(DomainDatabase.user_id==user_id)
-    query = do_limits(query, limit, offset)
-    return query.all()
+    return paginate(query, DomainDatabase.id, limit=limit, cursor=cursor,
+                    offset=offset, stream=stream)
 
 
-def get_user_domains(user_id, limit=None, offset=None):
+def get_user_domains(user_id, limit=None, offset=None, cursor=None,
+                     stream=False):
     """
     Get user `user_id` domains.
     @param user_id: user user_id
@@ -33,10 +43,15 @@ def get_user_domains(user_id, limit=None, offset=None):
     @type limit: positive integer
     @param offset: offset in limit
     @type offset: positive integer
+    @param cursor: cursor of page returned by previous query
+    @type cursor: string
+    @param stream: return query to stream instead of page
+    @type stream: boolean
     """
     if is_positive_numeric(user_id) is not True:
         raise Invalid('User id must be positive integer')
-    return get_domains(user_id=user_id, limit=limit, offset=offset)
+    return get_domains(user_id=user_id, limit=limit, offset=offset,
+                       cursor=cursor, stream=stream)
 
 
 def get_domain(name, user_id=None):
@@ -50,11 +65,12 @@ def get_domain(name, user_id=None):
     raise DoesNotExist("Domain name=%s does not exist" % name)
 
 def get_domain_by_id(domain_id, user_id=None):
-    query = DomainDatabase.query()
     if user_id is not None:
-        query = query.filter(DomainDatabase.user_id == user_id)
+        query = _user_domain_by_id(domain_id=domain_id, user_id=user_id)
+    else:
+        query = _domain_by_id(domain_id=domain_id)
     try:
-        return query.filter(DomainDatabase.id == domain_id).one()
+        return query.one()
     except NoResultFound:
         pass
     raise DoesNotExist("Domain id=%s does not exist" % domain_id)
@@ -8,6 +8,7 @@ from bottle import request
 from lib.renki import app
 from lib.utils import ok, error, request_data
 from lib.database import connection as dbconn
+from lib.database.streaming import stream_list
 from lib.auth.func import require_perm
 from .domain_functions import get_user_domains, add_user_domain, \
     get_domain_by_id
@@ -39,7 +40,10 @@ def get_domains_route(user):
     except Exception as e:
         logger.exception(e)
         raise RenkiHTTPError('Unknown error occurred')
-    return ok({'domains': [x.as_dict() for x in domains]})
+    if params['stream']:
+        return stream_list('domains', domains, data={'next': None})
+    return ok({'domains': [x.as_dict() for x in domains],
+               'next': domains.next})
 
 @app.get('/<user_id:int>/domains')
 @app.get('/<user_id:int>/domains/')
@@ -62,7 +66,10 @@ def get_user_domains_route(user_id, user):
     except Exception as e:
         logger.exception(e)
         raise RenkiHTTPError('Unknown error occurred')
-    return ok({'domains': [x.as_dict() for x in domains]})
+    if params['stream']:
+        return stream_list('domains', domains, data={'next': None})
+    return ok({'domains': [x.as_dict() for x in domains],
+               'next': domains.next})
 
 @app.post('/domains')
 @app.post('/domains/')
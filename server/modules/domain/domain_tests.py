@@ -39,6 +39,7 @@ class TestDomainsRoutine(tu.BasicTest):
         u = self.user('test', ['domains_view_own'])
         schema = [
             tu.JSONArray('domains', minItems=0, maxItems=0, required=True),
+            tu.JSONCursor('next'),
         ]
         self.assertQ('/domains', user=u, status=tu.STATUS_OK, schema=schema)
         self.assertQ('/domains/', user=u, status=tu.STATUS_OK, schema=schema)
@@ -171,6 +172,7 @@ class TestDomainsRoutine(tu.BasicTest):
         # Ensure list is empty
         schema = [
             tu.JSONArray('domains', minItems=0, maxItems=0, required=True),
+            tu.JSONCursor('next'),
         ]
         self.assertQ('/domains', user=u, status=tu.STATUS_OK, schema=schema)
 
@@ -188,6 +190,7 @@ class TestDomainsRoutine(tu.BasicTest):
         # Ensure list is not empty
         schema = [
             tu.JSONArray('domains', minItems=1, maxItems=1, required=True),
+            tu.JSONCursor('next'),
         ]
         self.assertQ('/domains', user=u, status=tu.STATUS_OK, schema=schema)
 
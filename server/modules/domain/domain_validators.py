@@ -2,13 +2,11 @@
 # encoding: utf-8
 
 from lib.input import UserIDValidator, DomainValidator, InputParser, \
-    IntegerValidator, StringValidator
+    IntegerValidator, StringValidator, LimitedParser
 
 
-class DomainGetValidator(InputParser):
+class DomainGetValidator(LimitedParser):
     user_id = UserIDValidator('user_id')
-    limit = IntegerValidator('limit', positive=True, required=False)
-    offset = IntegerValidator('offset', positive=True, required=False)
 
 
 class UserDomainPutValidator(InputParser):
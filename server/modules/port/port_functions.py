@@ -3,12 +3,20 @@ from lib.exceptions import AlreadyExist, Invalid, DoesNotExist
 from lib.validators import is_positive_numeric
 from lib.database.basic_tables import ServiceGroupDatabase
 from lib.database.connection import session as dbsession
-from lib.database.filters import do_limits
-from sqlalchemy import func
+from lib.database.filters import paginate
+from lib.database.query_cache import CachedQuery
+from sqlalchemy import func, bindparam
 from sqlalchemy.orm.exc import NoResultFound
 from lib.auth.db import Users
 
-def get_ports(user_id=None, limit=None, offset=None):
+_port_by_id = CachedQuery('port_by_id', PortDatabase,
+    lambda q: q.filter(PortDatabase.id == bindparam('port_id')))
+_user_port_by_id = CachedQuery('user_port_by_id', PortDatabase,
+    lambda q: q.filter(PortDatabase.id == bindparam('port_id'),
+                       PortDatabase.user_id == bindparam('user_id')))
+
+def get_ports(user_id=None, limit=None, offset=None, cursor=None,
+              stream=False):
     query = PortDatabase.query()
 
     if user_id is not None:
@@ -19,24 +27,25 @@ def get_ports(user_id=None, limit=None, offset=None):
         query = query.filter(PortDatabase.user_id == user_id)
 
     query = query.filter(PortDatabase.user_id == user_id)
-    query = do_limits(query, limit, offset)
-    return query.all()
+    return paginate(query, PortDatabase.id, limit=limit, cursor=cursor,
+                    offset=offset, stream=stream)
 
-def get_user_ports(user_id, limit=None, offset=None):
-    return get_ports(user_id = user_id, limit = limit, offset = offset)
+def get_user_ports(user_id, limit=None, offset=None, cursor=None,
+                   stream=False):
+    return get_ports(user_id = user_id, limit = limit, offset = offset, cursor = cursor, stream = stream)
 
 def get_port_by_id(port_id, user_id=None):
-    query = PortDatabase.query()
-
     if user_id is not None:
         try:
             Users.get(user_id)
         except DoesNotExist:
             raise
-        query = query.filter(PortDatabase.user_id == user_id)
+        query = _user_port_by_id(port_id=port_id, user_id=user_id)
+    else:
+        query = _port_by_id(port_id=port_id)
 
     try:
-        return query.filter(PortDatabase.id == port_id).one()
+        return query.one()
     except NoResultFound:
         pass
 
@@ -67,9 +76,10 @@ def add_user_port(user_id, service_group_id):
 
     return port
 
-def get_port_history(user_id=None, limit=None, offset=None):
+def get_port_history(user_id=None, limit=None, offset=None, cursor=None,
+                     stream=False):
     PortHistory = PortDatabase.__history_mapper__.class_
-    query = PortHistory.query()
+    query = PortHistory.report_query()
 
     if user_id is not None:
         try:
@@ -79,8 +89,10 @@ def get_port_history(user_id=None, limit=None, offset=None):
         query = query.filter(PortHistory.user_id == user_id)
 
     query = query.filter(PortHistory.user_id == user_id)
-    query = do_limits(query, limit, offset)
-    return query.all()
+    return paginate(query, [PortHistory.id, PortHistory.version],
+                    limit=limit, cursor=cursor, offset=offset,
+                    stream=stream)
 
-def get_user_port_history(user_id, limit=None, offset=None):
-    return get_port_history(user_id = user_id, limit = limit, offset = offset)
\ No newline at end of file
+def get_user_port_history(user_id, limit=None, offset=None, cursor=None,
+                          stream=False):
+    return get_port_history(user_id = user_id, limit = limit, offset = offset, cursor = cursor, stream = stream)
\ No newline at end of file
@@ -4,6 +4,7 @@
 from bottle import request
 from lib.auth.func import require_perm
 from lib.database import connection as dbconn
+from lib.database.streaming import stream_list
 from lib.exceptions import DatabaseError, RenkiHTTPError, DoesNotExist, Invalid, SoftLimitReached, HardLimitReached, PermissionDenied
 from lib.renki import app
 from lib.utils import ok, error
@@ -31,7 +32,9 @@ def ports_index(user):
     except Exception as e:
         logger.exception(e)
         raise RenkiHTTPError('Unknown error occurred')
-    return ok({'ports': [x.as_dict() for x in ports]})
+    if params['stream']:
+        return stream_list('ports', ports, data={'next': None})
+    return ok({'ports': [x.as_dict() for x in ports], 'next': ports.next})
 
 @app.get('/<user_id:int>/ports')
 @app.get('/<user_id:int>/ports/')
@@ -50,7 +53,9 @@ def admin_ports_index(user, user_id):
     except Exception as e:
         logger.exception(e)
         raise RenkiHTTPError('Unknown error occurred')
-    return ok({'ports': [x.as_dict() for x in ports]})
+    if params['stream']:
+        return stream_list('ports', ports, data={'next': None})
+    return ok({'ports': [x.as_dict() for x in ports], 'next': ports.next})
 
 @app.post('/ports')
 @app.post('/ports/')
@@ -166,6 +171,7 @@ def ports_history(user):
     except Exception as e:
         logger.exception(e)
         raise RenkiHTTPError('Unknown error occurred')
-        
-    return ok({'ports': [x.to_dict() for x in ports]})
+    if params['stream']:
+        return stream_list('ports', ports, data={'next': None})
+    return ok({'ports': [x.to_dict() for x in ports], 'next': ports.next})
     #return ok({'ports': [str(x) + str(vars(ports)[x]) for x in vars(ports)]})#[x.as_dict() for x in ports]})
\ No newline at end of file
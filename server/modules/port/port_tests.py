@@ -79,6 +79,13 @@ class TestPortsRoutine(tu.BasicTest):
         self.assertQ('/ports', user=u, status=tu.STATUS_OK)
         self.assertQ('/ports/', user=u, status=tu.STATUS_OK)
 
+    def test_ports_get_user_stream(self):
+        u = self.user('test', ['ports_view_own'])
+        p = self.create_port(u.user.id)
+        q = self.q('/ports', user=u, args={'stream': 'true'})
+        self.assertStatus(q, tu.STATUS_OK)
+        self.assertEqual([x['id'] for x in q.json['ports']], [p.id])
+
     def test_ports_push_user_anon(self):
         self.assertContainsNone(ServiceGroupDatabase, ServiceGroupDatabase.id == 123)
         self.assertQ('/ports', user=None, method='POST', status=tu.STATUS_NOAUTH, args={'service_group_id': 123})
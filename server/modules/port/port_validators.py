@@ -1,11 +1,9 @@
 # encoding: utf-8
 
-from lib.input import UserIDValidator, InputParser, IntegerValidator
+from lib.input import UserIDValidator, InputParser, IntegerValidator, LimitedParser
 
-class PortGetValidator(InputParser):
+class PortGetValidator(LimitedParser):
     user_id = UserIDValidator('user_id')
-    limit = IntegerValidator('limit', positive = True, required = False)
-    offset = IntegerValidator('offset', positive = True, required = False)
 
 class PortAddValidator(InputParser):
     user_id = UserIDValidator('user_id')
@@ -3,11 +3,35 @@ from lib.database import connection as dbconn
 from lib.exceptions import AlreadyExist, DatabaseError, RenkiHTTPError, DoesNotExist, Invalid
 from lib.auth.db import Users
 from lib.database.basic_tables import ServiceGroupDatabase
-from lib.database.filters import do_limits
+from lib.database.filters import paginate
 from .repository_database import RepositoryDatabase
+from lib.database.query_cache import CachedQuery
+from sqlalchemy import bindparam
 from sqlalchemy.orm.exc import NoResultFound
 
-def get_user_repositories(user_id=None, limit=None, offset=None, repo_type=None):
+def _repository_query(by_user, by_type):
+    def build(query):
+        query = query.filter(RepositoryDatabase.id == bindparam('repo_id'))
+        if by_user:
+            query = query.filter(
+                        RepositoryDatabase.user_id == bindparam('user_id'))
+        if by_type:
+            query = query.filter(RepositoryDatabase.type == bindparam('type'))
+        return query
+    name = 'repository_by_id'
+    if by_user:
+        name += '_user'
+    if by_type:
+        name += '_type'
+    return CachedQuery(name, RepositoryDatabase, build)
+
+# Queries by which optional conditions are given
+_repository_by_id = dict(((by_user, by_type),
+                          _repository_query(by_user, by_type))
+                         for by_user in (False, True)
+                         for by_type in (False, True))
+
+def get_user_repositories(user_id=None, limit=None, offset=None, repo_type=None, cursor=None):
     query = RepositoryDatabase.query()
 
     if user_id is not None:
@@ -15,28 +39,24 @@ def get_user_repositories(user_id=None, limit=None, offset=None, repo_type=None)
             Users.get(user_id)
         except DoesNotExist:
             raise
-        query.filter(RepositoryDatabase.user_id == user_id)
+        query = query.filter(RepositoryDatabase.user_id == user_id)
 
     if repo_type is not None:
-        query.filter(RepositoryDatabase.repo_type == repo_type)
+        query = query.filter(RepositoryDatabase.type == repo_type)
 
-    query = do_limits(query, limit, offset)
-    return query.all()
+    return paginate(query, RepositoryDatabase.id, limit=limit, cursor=cursor,
+                    offset=offset)
 
 def get_repository_by_id(user_id, type, repo_id):
-    query = RepositoryDatabase.query()
     if user_id is not None:
         try:
             Users.get(user_id)
         except DoesNotExist:
             raise
-        query = query.filter(RepositoryDatabase.user_id == user_id)
-
-    if type is not None:
-        query = query.filter(RepositoryDatabase.type == type)
-
+    query = _repository_by_id[(user_id is not None, type is not None)]
+    query = query(repo_id=repo_id, user_id=user_id, type=type)
     try:
-        return query.filter(RepositoryDatabase.id == repo_id).one()
+        return query.one()
     except NoResultFound:
         pass
 
@@ -25,6 +25,9 @@ def repositories_index(user):
     data = dict(request.params.items())
     data['user_id'] = user.user_id
     params = RepositoryGetValidator.parse(data)
+    if params.pop('stream'):
+        # Repositories are grouped by type
+        raise Invalid('Streaming is not supported')
     try:
         repos = get_user_repositories(**params)
     except (RenkiHTTPError, Invalid):
@@ -32,7 +35,7 @@ def repositories_index(user):
     except Exception as e:
         logger.exception(e)
         raise RenkiHTTPError('Unknown error occurred')
-    return ok({'svn': [x.as_dict() for x in repos if x.type == 'svn'], 'git': [x.as_dict() for x in repos if x.type == 'git']})
+    return ok({'svn': [x.as_dict() for x in repos if x.type == 'svn'], 'git': [x.as_dict() for x in repos if x.type == 'git'], 'next': repos.next})
 
 @app.get('/repositories/<type>/<repo_id:int>')
 @app.get('/repositories/<type>/<repo_id:int>/')
@@ -1,11 +1,9 @@
 # encoding: utf-8
 
-from lib.input import UserIDValidator, InputParser, IntegerValidator, ListValueValidator,StringValidator
+from lib.input import UserIDValidator, InputParser, IntegerValidator, ListValueValidator,StringValidator, LimitedParser
 
-class RepositoryGetValidator(InputParser):
+class RepositoryGetValidator(LimitedParser):
     user_id = UserIDValidator('user_id')
-    limit = IntegerValidator('limit', positive = True, required = False)
-    offset = IntegerValidator('offset', positive = True, required = False)
 
 class RepositoryAddValidator(InputParser):
     user_id = UserIDValidator('user_id')
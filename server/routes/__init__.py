@@ -8,4 +8,6 @@ Renki JSON API routes
 
 from .default_routes import index_route, error_route, version_route, \
     error400, error401, error403, error404, error405, error409, error500
-from .login_routes import login_valid, login_route
+from .login_routes import login_valid, login_route, logout_route
+from .stats_routes import stats_route
+from .usage_routes import usage_route
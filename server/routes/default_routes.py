@@ -8,7 +8,6 @@ from lib.utils import ok as ret_ok, error as ret_error, noauth as ret_noauth, \
     denied as ret_denied, conflict as ret_conflict
 from lib.database import connection
 import json
-from sqlalchemy import func
 
 import logging
 logger = logging.getLogger('default_routes')
@@ -60,13 +59,12 @@ def rollback():
     """
     Do database rollback
     """
+    if not connection.session.has_session():
+        # Request session is already closed
+        return
     sessio = connection.session.session()
     if sessio.transaction.is_active:
-        try:
-            xid = sessio.query(func.txid_current()).first()
-            logger.info("Transaction id: %s" % xid)
-        except:
-            pass
+        connection.log_transaction_id(sessio, "Rollback")
     logger.debug("Rollback due to error")
     sessio.rollback()
 
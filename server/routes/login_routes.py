@@ -6,6 +6,7 @@ from lib.utils import ok as ret_ok, error as ret_error
 from lib import renki_settings as settings
 from lib.database import connection
 from lib.exceptions import AuthenticationFailed
+from lib.auth.context import get_auth_context
 
 
 import logging
@@ -17,14 +18,11 @@ def login_valid():
     """
     Test if api key is valid
     """
-    key = request.GET.get('apikey', '')
-    if not key and request.json:
-        key = request.json.get('apikey', '')
-    if not key:
+    ctx = get_auth_context()
+    if not ctx.key:
         abort(401, "API key is mandatory")
-    for mod in settings.AUTHENTICATION_MODULES:
-        if mod.valid_key(key):
-            return ret_ok({'message': 'API key is valid'})
+    if ctx.is_authenticated:
+        return ret_ok({'message': 'API key is valid'})
     return ret_error('API key is not valid')
 
 
@@ -46,3 +44,16 @@ def login_route():
         except AuthenticationFailed:
             pass
     return abort(401, 'Authentication failed')
+
+
+@app.post('/logout')
+def logout_route():
+    """
+    Revoke api key
+    """
+    ctx = get_auth_context()
+    if not ctx.is_authenticated:
+        abort(401, "Invalid or missing API key")
+    ctx.module.revoke_key(ctx.key)
+    connection.session.safe_commit()
+    return ret_ok({'message': 'API key revoked'})
@@ -0,0 +1,15 @@
+# encoding: utf-8
+
+from lib.renki import app
+from lib.utils import ok as ret_ok
+from lib.auth.func import require_perm
+from lib import stats
+
+
+@app.get('/stats')
+@require_perm(permission='stats_view_all')
+def stats_route(user):
+    """
+    Show connection pool and cache statistics
+    """
+    return ret_ok({'stats': stats.collect()})
@@ -0,0 +1,15 @@
+# encoding: utf-8
+
+from lib.renki import app
+from lib.auth.func import require_perm
+from lib.database.streaming import stream_rows
+from lib.database.usage import usage_report
+
+
+@app.get('/usage')
+@require_perm(permission='usage_view_all')
+def usage_route(user):
+    """
+    Show resource usage and limits of all users, response is streamed
+    """
+    return stream_rows('usage', usage_report())
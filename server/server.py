@@ -3,8 +3,12 @@
 
 from lib import check_settings
 from lib import renki, renki_settings as settings
-from lib.database.connection import initialize_connection, session
-from lib.history_meta import versioned_session
+from lib.database.connection import initialize_connection, \
+    session as dbsession
+from lib.database.usage import UsageReconciler
+from lib.auth.purge import AuthKeyPurger
+from lib.stats import StatsLogger
+from lib import threads
 
 # Importing routes and modules registers also tables
 import lib.auth.db
@@ -13,6 +17,7 @@ import modules
 
 from bottle import run
 import logging
+import os
 
 if __name__ == '__main__':
     check_settings.set_settings()
@@ -20,7 +25,23 @@ if __name__ == '__main__':
     # Run server
     logger.info("Starting server")
     initialize_connection()
-    versioned_session(session.session())
+    dbsession.begin_request()
+    try:
+        lib.auth.db.load_default_limits()
+    finally:
+        dbsession.end_request()
+    reloader = True
+    # With reloader the main process only watches files and restarts the
+    # child process which serves requests, so threads run only in the child
+    if os.environ.get('BOTTLE_CHILD') or not reloader:
+        if settings.AUTH_KEY_PURGE_INTERVAL:
+            AuthKeyPurger().start()
+        if settings.STATS_LOG_INTERVAL:
+            StatsLogger().start()
+        if settings.USAGE_RECONCILE_INTERVAL:
+            UsageReconciler().start()
     run(renki.app, host=settings.BIND_HOST, port=settings.BIND_PORT,
-        debug=settings.DEBUG, reloader=True)
+        debug=settings.DEBUG, reloader=reloader)
+    for thread in threads.server_threads:
+        thread.stop()
     logger.info("Server stopped")
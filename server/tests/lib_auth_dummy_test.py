@@ -0,0 +1,50 @@
+# encoding: utf-8
+
+
+import unittest
+from lib import renki_settings as settings
+from lib.auth.dummy import DummyAuthenticationModule
+from lib.exceptions import AuthenticationFailed
+
+
+class TestDummyAuthentication(unittest.TestCase):
+    def setUp(self):
+        self.mod = DummyAuthenticationModule()
+
+    def test_authenticate(self):
+        key = self.mod.authenticate('test', 'test')
+        self.assertTrue(self.mod.valid_key(key))
+        self.assertEqual(self.mod.get_user(key).username, 'test')
+        self.assertTrue(self.mod.has_permission(key, 'domains_view_own'))
+        self.assertFalse(self.mod.has_permission(key, 'domains_view_all'))
+
+    def test_invalid_password(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.mod.authenticate('test', 'admin')
+
+    def test_invalid_key(self):
+        self.assertFalse(self.mod.valid_key('invalid'))
+        self.assertFalse(self.mod.valid_key(None))
+        self.assertEqual(self.mod.get_user('invalid'), None)
+
+    def test_revoke_key(self):
+        key = self.mod.authenticate('admin', 'admin')
+        self.mod.revoke_key(key)
+        self.assertFalse(self.mod.valid_key(key))
+
+    def test_key_prefix(self):
+        key = self.mod.authenticate('test', 'test')
+        self.assertTrue(key.startswith('dummy-'))
+        self.assertTrue(self.mod.untag_key(key))
+        self.assertEqual(self.mod.untag_key('basic-' + key), None)
+
+    def test_max_keys(self):
+        self.mod.keys.configure(size=2)
+        keys = [self.mod.authenticate('test', 'test') for i in range(3)]
+        self.assertFalse(self.mod.valid_key(keys[0]))
+        self.assertTrue(self.mod.valid_key(keys[1]))
+        self.assertTrue(self.mod.valid_key(keys[2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+# encoding: utf-8
+
+
+import unittest
+import time
+from lib import renki_settings as settings
+from lib.auth.signed import create_key, parse_key, \
+    SignedAuthenticationModule, RevokedKeys
+
+
+class TestSignedKeys(unittest.TestCase):
+    def setUp(self):
+        self._secret = settings.AUTH_SECRET
+        self._epoch = settings.SIGNED_KEY_EPOCH
+        settings.AUTH_SECRET = 'test secret'
+        settings.SIGNED_KEY_EPOCH = 0
+
+    def tearDown(self):
+        settings.AUTH_SECRET = self._secret
+        settings.SIGNED_KEY_EPOCH = self._epoch
+
+    def test_valid_key(self):
+        key = create_key(12)
+        user_id, expires, epoch = parse_key(key)
+        self.assertEqual(user_id, 12)
+        self.assertEqual(epoch, 0)
+        self.assertTrue(expires > time.time())
+
+    def test_unique_keys(self):
+        self.assertNotEqual(create_key(12), create_key(12))
+
+    def test_expired_key(self):
+        key = create_key(12, expires=time.time() - 1)
+        self.assertEqual(parse_key(key), None)
+
+    def test_old_epoch(self):
+        key = create_key(12)
+        settings.SIGNED_KEY_EPOCH = 1
+        self.assertEqual(parse_key(key), None)
+
+    def test_tampered_key(self):
+        key = create_key(12)
+        other = create_key(13)
+        payload = other.split('.')[0]
+        signature = key.split('.')[1]
+        self.assertEqual(parse_key('%s.%s' % (payload, signature)), None)
+        self.assertEqual(parse_key(key[:-2]), None)
+        self.assertEqual(parse_key('invalid'), None)
+        self.assertEqual(parse_key(''), None)
+        self.assertEqual(parse_key(None), None)
+
+    def test_other_secret(self):
+        key = create_key(12)
+        settings.AUTH_SECRET = 'other secret'
+        self.assertEqual(parse_key(key), None)
+
+    def test_revoke_key(self):
+        mod = SignedAuthenticationModule()
+        key = mod.tag_key(create_key(12))
+        self.assertTrue(mod.valid_key(key))
+        mod.revoke_key(key)
+        self.assertFalse(mod.valid_key(key))
+        self.assertTrue(mod.valid_key(mod.tag_key(create_key(12))))
+
+    def test_untagged_key(self):
+        mod = SignedAuthenticationModule()
+        self.assertFalse(mod.valid_key(create_key(12)))
+        self.assertFalse(mod.valid_key('basic-' + create_key(12)))
+
+
+class TestRevokedKeys(unittest.TestCase):
+    def test_not_evicted(self):
+        revoked = RevokedKeys()
+        expires = time.time() + 60
+        for i in range(1000):
+            revoked.add('key%d' % i, expires)
+        self.assertTrue('key0' in revoked)
+        self.assertEqual(len(revoked), 1000)
+
+    def test_expired(self):
+        revoked = RevokedKeys()
+        revoked.add('old', time.time() - 1)
+        self.assertFalse('old' in revoked)
+        revoked.add('soon', time.time() + 0.01)
+        self.assertTrue('soon' in revoked)
+        time.sleep(0.02)
+        self.assertFalse('soon' in revoked)
+        # Expired signatures are pruned on add
+        revoked.add('new', time.time() + 60)
+        self.assertEqual(len(revoked), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# encoding: utf-8
+
+
+import unittest
+import time
+from lib.cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = TTLCache(size=10, ttl=60)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('b', 2), 2)
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+
+    def test_size_limit(self):
+        cache = TTLCache(size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # Access a, so b is least recently used
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entry_expires(self):
+        cache = TTLCache(size=10, ttl=60)
+        cache.set('a', 1, expires=time.time() - 1)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl_expires(self):
+        cache = TTLCache(size=10, ttl=0.01)
+        cache.set('a', 1, expires=time.time() + 60)
+        time.sleep(0.02)
+        self.assertEqual(cache.get('a'), None)
+
+    def test_invalidate(self):
+        cache = TTLCache(size=10, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        cache.invalidate('a')
+        self.assertEqual(cache.get('a'), None)
+        cache.invalidate_if(lambda key, value: value == 2)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 3)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
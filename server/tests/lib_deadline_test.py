@@ -0,0 +1,163 @@
+# encoding: utf-8
+
+
+import unittest
+import time
+from sqlalchemy import create_engine
+from lib import renki_settings as settings
+from lib.database import deadline
+from lib.exceptions import RequestTimeout, RenkiHTTPError
+
+
+class Route(object):
+    method = 'GET'
+    rule = '/test'
+
+    def __init__(self, **config):
+        self.config = config
+
+
+class Cursor(object):
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+    def close(self):
+        pass
+
+
+class NamedCursor(object):
+    def execute(self, statement):
+        raise AssertionError("SET run with statement cursor")
+
+
+class Connection(object):
+    def __init__(self):
+        self.statements = []
+        self.info = {}
+        self.dialect = type('Dialect', (object,), {'name': 'postgresql'})
+        self.connection = self
+
+    def cursor(self):
+        return Cursor(self.statements)
+
+
+class TestStatementTimeout(unittest.TestCase):
+    def tearDown(self):
+        deadline.end()
+
+    def test_remaining(self):
+        d = deadline.Deadline('test', 30)
+        d.expires = time.time() + 10
+        self.assertTrue(9900 < d.statement_timeout <= 10000)
+
+    def test_new_timeout(self):
+        d = deadline.begin('test', 30)
+        self.assertTrue(deadline.new_timeout(d) > 29000)
+        self.assertEqual(deadline.new_timeout(d, (d, 31000)), None)
+        # Set again when remaining time has shrunk
+        d.expires = time.time() + 10
+        self.assertTrue(deadline.new_timeout(d, (d, 30000)) <= 10000)
+        # New request sets timeout even if old one was shorter
+        self.assertTrue(deadline.new_timeout(d, (object(), 1000)) > 9000)
+        self.assertEqual(deadline.new_timeout(None, (d, 30000)), 0)
+        self.assertEqual(deadline.new_timeout(None), None)
+        # Unknown timeout is always set
+        unknown = deadline.TIMEOUT_UNKNOWN
+        self.assertEqual(deadline.new_timeout(None, unknown), 0)
+        self.assertTrue(deadline.new_timeout(d, unknown) <= 10000)
+
+    def test_separate_cursor(self):
+        conn = Connection()
+        d = deadline.begin('test', 30)
+        deadline.before_cursor_execute(conn, NamedCursor(), 'SELECT 1', (),
+                                       None, False)
+        self.assertEqual(len(conn.statements), 1)
+        self.assertTrue(conn.statements[0].startswith('SET statement_timeout'))
+        self.assertEqual(conn.info[deadline.TIMEOUT_KEY][0], d)
+        deadline.before_cursor_execute(conn, NamedCursor(), 'SELECT 1', (),
+                                       None, False)
+        self.assertEqual(len(conn.statements), 1)
+        deadline.end()
+        deadline.before_cursor_execute(conn, NamedCursor(), 'SELECT 1', (),
+                                       None, False)
+        self.assertEqual(conn.statements[1], 'SET statement_timeout = 0')
+
+    def test_rollback(self):
+        conn = Connection()
+        deadline.begin('test', 0.01)
+        deadline.before_cursor_execute(conn, NamedCursor(), 'SELECT 1', (),
+                                       None, False)
+        deadline.end()
+        # Rollback may leave short timeout of earlier request to connection
+        deadline.reset_timeout(conn)
+        deadline.before_cursor_execute(conn, NamedCursor(), 'SELECT 1', (),
+                                       None, False)
+        self.assertEqual(conn.statements[1], 'SET statement_timeout = 0')
+        self.assertEqual(conn.info[deadline.TIMEOUT_KEY], (None, 0))
+
+
+class TestDeadline(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        deadline.instrument(self.engine)
+
+    def tearDown(self):
+        deadline.end()
+        deadline.route_timeouts.pop('GET /test', None)
+
+    def test_statement_after_deadline(self):
+        deadline.begin('test', 0.01)
+        self.engine.execute('SELECT 1')
+        time.sleep(0.02)
+        with self.assertRaises(Exception):
+            self.engine.execute('SELECT 1')
+        self.assertTrue(deadline.end().exceeded)
+
+    def test_no_deadline(self):
+        self.assertEqual(deadline.begin('test', 0), None)
+        self.engine.execute('SELECT 1')
+
+    def test_plugin(self):
+        def route():
+            time.sleep(0.02)
+            try:
+                self.engine.execute('SELECT 1')
+            except Exception:
+                raise RenkiHTTPError('Unknown error occurred')
+        wrapper = deadline.DeadlinePlugin().apply(route, Route(deadline=0.01))
+        with self.assertRaises(RequestTimeout):
+            wrapper()
+        self.assertEqual(deadline.get_stats()['GET /test'], 1)
+        self.assertEqual(deadline.current(), None)
+
+    def test_plugin_default(self):
+        def route():
+            self.assertEqual(deadline.current().seconds,
+                             settings.REQUEST_DEADLINE)
+            raise RenkiHTTPError('Failure')
+        wrapper = deadline.DeadlinePlugin().apply(route, Route())
+        with self.assertRaises(RenkiHTTPError) as e:
+            wrapper()
+        self.assertFalse(isinstance(e.exception, RequestTimeout))
+
+    def test_plugin_stream(self):
+        def route():
+            def generate():
+                yield str(deadline.current().seconds)
+                time.sleep(0.02)
+                self.engine.execute('SELECT 1')
+                yield 'not reached'
+            return generate()
+        wrapper = deadline.DeadlinePlugin().apply(route, Route(deadline=0.01))
+        stream = wrapper()
+        self.assertEqual(next(stream), '0.01')
+        self.assertRaises(deadline.DeadlineExceeded, next, stream)
+        self.assertEqual(deadline.get_stats()['GET /test'], 1)
+        self.assertEqual(deadline.current(), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# encoding: utf-8
+
+
+import unittest
+from sqlalchemy import create_engine, Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from lib.database.filters import encode_cursor, decode_cursor, paginate, \
+    Page
+from lib.exceptions import Invalid
+
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'item'
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+
+
+class TestCursor(unittest.TestCase):
+    def test_roundtrip(self):
+        cursor = encode_cursor([12, 'a'])
+        self.assertEqual(decode_cursor(cursor, [Item.id, Item.name]),
+                         [12, 'a'])
+
+    def test_invalid(self):
+        with self.assertRaises(Invalid):
+            decode_cursor('invalid!', [Item.id])
+        with self.assertRaises(Invalid):
+            decode_cursor(encode_cursor([1, 2]), [Item.id])
+        with self.assertRaises(Invalid):
+            decode_cursor(encode_cursor({'id': 1}), [Item.id])
+
+    def test_invalid_type(self):
+        for value in ('1', 1.5, True, None, [1], {'id': 1}):
+            with self.assertRaises(Invalid):
+                decode_cursor(encode_cursor([value]), [Item.id])
+        for value in (1, None, ['a']):
+            with self.assertRaises(Invalid):
+                decode_cursor(encode_cursor([value]), [Item.name])
+
+    def test_page(self):
+        page = Page([1, 2], next='abc')
+        self.assertEqual(page, [1, 2])
+        self.assertEqual(page.next, 'abc')
+        self.assertEqual(Page([]).next, None)
+
+
+class TestPaginate(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+        for i, name in enumerate(['e', 'd', 'c', 'b', 'a']):
+            self.session.add(Item(id=i + 1, name=name))
+        self.session.commit()
+        self.query = self.session.query(Item)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_pages(self):
+        page = paginate(self.query, Item.id, limit=2)
+        self.assertEqual([i.id for i in page], [1, 2])
+        page = paginate(self.query, Item.id, limit=2, cursor=page.next)
+        self.assertEqual([i.id for i in page], [3, 4])
+        page = paginate(self.query, Item.id, limit=2, cursor=page.next)
+        self.assertEqual([i.id for i in page], [5])
+        self.assertEqual(page.next, None)
+
+    def test_no_limit(self):
+        page = paginate(self.query, Item.id)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(page.next, None)
+
+    def test_columns(self):
+        columns = [Item.name, Item.id]
+        page = paginate(self.query, columns, limit=3)
+        self.assertEqual([i.name for i in page], ['a', 'b', 'c'])
+        page = paginate(self.query, columns, limit=3, cursor=page.next)
+        self.assertEqual([i.name for i in page], ['d', 'e'])
+
+    def test_fetch(self):
+        fetch = lambda query: [{'id': i.id} for i in query]
+        page = paginate(self.query, Item.id, limit=4, fetch=fetch)
+        self.assertEqual(page, [{'id': i} for i in range(1, 5)])
+        self.assertEqual(decode_cursor(page.next, [Item.id]), [4])
+
+    def test_stream(self):
+        query = paginate(self.query, Item.id, limit=2, stream=True,
+                         cursor=encode_cursor([1]))
+        self.assertEqual([i.id for i in query], [2, 3])
+
+    def test_invalid(self):
+        with self.assertRaises(Invalid):
+            paginate(self.query, Item.id, limit=2, cursor=encode_cursor(['1']))
+        with self.assertRaises(Invalid):
+            paginate(self.query, Item.id, limit=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
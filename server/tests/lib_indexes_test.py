@@ -0,0 +1,41 @@
+# encoding: utf-8
+
+
+import unittest
+from sqlalchemy import MetaData, Table, Column, Integer, ForeignKey, Index, \
+    create_engine
+from sqlalchemy.engine import reflection
+from lib.database.indexes import unindexed_foreign_keys, missing_indexes
+
+
+def create_metadata(index=True):
+    metadata = MetaData()
+    Table('parent', metadata, Column('id', Integer, primary_key=True))
+    Table('child', metadata, Column('id', Integer, primary_key=True),
+          Column('parent_id', Integer, ForeignKey('parent.id'),
+                 index=index))
+    Table('pair', metadata, Column('id', Integer, primary_key=True),
+          Column('child_id', Integer, ForeignKey('child.id')),
+          Column('parent_id', Integer, ForeignKey('parent.id')),
+          Index('ix_pair_parent_id_child_id', 'parent_id', 'child_id'))
+    return metadata
+
+
+class TestIndexAdvisor(unittest.TestCase):
+    def test_declared(self):
+        self.assertEqual(unindexed_foreign_keys(create_metadata()),
+                         [('pair', 'child_id')])
+
+    def test_database(self):
+        engine = create_engine('sqlite://')
+        create_metadata(index=False).create_all(engine)
+        inspector = reflection.Inspector.from_engine(engine)
+        metadata = create_metadata()
+        self.assertEqual(unindexed_foreign_keys(metadata, inspector),
+                         [('child', 'parent_id'), ('pair', 'child_id')])
+        self.assertEqual(missing_indexes(metadata, inspector),
+                         ['ix_child_parent_id'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,7 @@
 
 import unittest
 from lib.input import InputParser, StringValidator, IntegerValidator, \
-    DomainValidator
+    DomainValidator, BooleanValidator
 from lib.exceptions import Invalid
 
 
@@ -217,6 +217,19 @@ class TestIntegerValidator(unittest.TestCase):
         self.p = IntegerValidator('name', default=1)
         self.assertEqual(self.p.default, 1)
 
+    def test_boolean(self):
+        self.p = BooleanValidator('name')
+        self.assertEqual(self.p.validate('true'), True)
+        self.assertEqual(self.p.validate('1'), True)
+        self.assertEqual(self.p.validate(False), False)
+        self.assertEqual(self.p.validate('No'), False)
+
+        with self.assertRaises(Invalid):
+            self.p.validate('maybe')
+
+        with self.assertRaises(Invalid):
+            self.p.validate(2)
+
 
 class TestDomainValidator(unittest.TestCase):
 
@@ -0,0 +1,62 @@
+# encoding: utf-8
+
+
+import unittest
+from hashlib import sha512
+from lib import renki_settings as settings
+from lib.auth.password import hash_password, check_password
+
+
+class TestPasswordHashing(unittest.TestCase):
+    def setUp(self):
+        self._settings = (settings.PASSWORD_HASHER,
+                          settings.PASSWORD_ITERATIONS,
+                          settings.PASSWORD_SCRYPT_N,
+                          settings.PASSWORD_HASH_WORKERS)
+        settings.PASSWORD_HASHER = 'pbkdf2'
+        settings.PASSWORD_ITERATIONS = 1000
+        settings.PASSWORD_SCRYPT_N = 1024
+        settings.PASSWORD_HASH_WORKERS = 0
+
+    def tearDown(self):
+        (settings.PASSWORD_HASHER, settings.PASSWORD_ITERATIONS,
+         settings.PASSWORD_SCRYPT_N, settings.PASSWORD_HASH_WORKERS) = \
+            self._settings
+
+    def test_pbkdf2(self):
+        pwhash = hash_password('secret')
+        self.assertTrue(pwhash.startswith('$pbkdf2-sha512$1000$'))
+        self.assertEqual(check_password('secret', pwhash), (True, False))
+        self.assertEqual(check_password('wrong', pwhash), (False, False))
+
+    def test_scrypt(self):
+        settings.PASSWORD_HASHER = 'scrypt'
+        pwhash = hash_password('secret')
+        self.assertTrue(pwhash.startswith('$scrypt$1024$'))
+        self.assertEqual(check_password('secret', pwhash), (True, False))
+        self.assertEqual(check_password('wrong', pwhash), (False, False))
+
+    def test_legacy_hash(self):
+        salt = 'abcdef'
+        pwhash = "$1$%s$%s" % (salt, sha512(salt.encode("utf-8") +
+                                            b'secret').hexdigest())
+        self.assertEqual(check_password('secret', pwhash), (True, True))
+        self.assertEqual(check_password('wrong', pwhash), (False, False))
+
+    def test_changed_work_factor(self):
+        pwhash = hash_password('secret')
+        settings.PASSWORD_ITERATIONS = 2000
+        self.assertEqual(check_password('secret', pwhash), (True, True))
+
+    def test_invalid_hash(self):
+        self.assertEqual(check_password('secret', 'invalid'), (False, False))
+        self.assertEqual(check_password('secret', '$md5$a$b'), (False, False))
+
+    def test_worker_pool(self):
+        settings.PASSWORD_HASH_WORKERS = 1
+        pwhash = hash_password('secret')
+        self.assertEqual(check_password('secret', pwhash), (True, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
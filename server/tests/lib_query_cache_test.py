@@ -0,0 +1,104 @@
+# encoding: utf-8
+
+
+import threading
+import unittest
+from sqlalchemy import Column, Integer, String, bindparam, create_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from lib.database import connection
+from lib.database.connection import session as dbsession
+from lib.database.query_cache import CompiledCache, CachedQuery, get_stats
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'query_cache_test_item'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class Connection(object):
+    """
+    Database connection of dbsession using sqlite engine
+    """
+    def __init__(self, engine):
+        self.sessionmaker = sessionmaker(bind=engine)
+
+    def create_session(self):
+        return self.sessionmaker()
+
+
+class TestCompiledCache(unittest.TestCase):
+    def test_hits(self):
+        cache = CompiledCache()
+        self.assertEqual(cache.get('a'), None)
+        cache['a'] = 1
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache['a'], 1)
+        self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1, 'size': 1,
+                                         'hit_rate': 2 / 3.0})
+
+    def test_size(self):
+        cache = CompiledCache(size=2)
+        for i in range(3):
+            cache[i] = i
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.misses, 3)
+
+    def test_threads(self):
+        cache = CompiledCache()
+        cache['a'] = 1
+        def lookup():
+            for i in range(1000):
+                cache.get('a')
+        threads = [threading.Thread(target=lookup) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.hits, 4000)
+
+    def test_compiled_once(self):
+        query = CachedQuery('test_item_by_id', Item,
+            lambda q: q.filter(Item.id == bindparam('id')))
+        self.assertTrue(query.statement is query.statement)
+        engine = create_engine('sqlite://').execution_options(
+                    compiled_cache=query.cache)
+        Base.metadata.create_all(engine)
+        for i in range(3):
+            engine.execute(query.statement, id=i).fetchall()
+        self.assertEqual(get_stats()['test_item_by_id']['misses'], 1)
+        self.assertEqual(get_stats()['test_item_by_id']['hits'], 2)
+
+
+class TestCachedQuery(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self._conn = connection.conn
+        connection.conn = Connection(engine)
+        dbsession.begin_request()
+        for i in range(1, 4):
+            dbsession.session().add(Item(id=i, name='item%d' % i))
+        dbsession.commit()
+
+    def tearDown(self):
+        dbsession.end_request()
+        connection.conn = self._conn
+
+    def test_call(self):
+        query = CachedQuery('test_item_call', Item,
+            lambda q: q.filter(Item.id == bindparam('id')))
+        for i in range(1, 4):
+            item = query(id=i).one()
+            self.assertEqual(item.name, 'item%d' % i)
+        self.assertEqual(query(id=5).all(), [])
+        stats = get_stats()['test_item_call']
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
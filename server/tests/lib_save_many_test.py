@@ -0,0 +1,147 @@
+# encoding: utf-8
+
+
+import time
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from lib.communication import topology
+from lib.communication.ticket_tables import TicketDatabase, \
+    TicketGroupDatabase
+from lib.communication.topology import Service
+from lib.database import connection, invalidation
+from lib.database.connection import session as dbsession
+from lib.database.tables import metadata
+from lib.database.usage import UsageCounters
+from lib.exceptions import SoftLimitReached, HardLimitReached, \
+    DoesNotExist
+from lib.history_meta import versioned_session
+import lib.auth.db
+from modules.port.port_database import PortDatabase
+
+
+class Connection(object):
+    """
+    Database connection of dbsession using sqlite engine
+    """
+    def __init__(self, engine):
+        self.sessionmaker = sessionmaker(bind=engine)
+        versioned_session(self.sessionmaker)
+
+    def create_session(self):
+        return self.sessionmaker()
+
+
+class User(object):
+    def __init__(self, *permissions):
+        self.permissions = permissions
+
+    def has_permission(self, permission):
+        return permission in self.permissions
+
+
+class TestSaveMany(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        metadata.create_all(self.engine)
+        self._conn = connection.conn
+        connection.conn = Connection(self.engine)
+        dbsession.begin_request()
+        for user_id in (1, 2):
+            dbsession.session().add(lib.auth.db.Users(id=user_id))
+        dbsession.commit()
+        self.ticket_inserts = []
+        event.listen(self.engine, 'before_cursor_execute', self.on_execute)
+        topology.topology_cache.set(topology.TOPOLOGY_KEY, {
+            1: (Service(1, 'web', 1), Service(2, 'web', 2))},
+            time.time() + 60)
+
+    def tearDown(self):
+        dbsession.end_request()
+        connection.conn = self._conn
+        topology.invalidate_topology()
+        lib.auth.db.limits_cache.clear()
+        lib.auth.db._default_limits = None
+
+    def on_execute(self, conn, cursor, statement, parameters, context,
+                   executemany):
+        if statement.startswith('INSERT INTO ticket '):
+            self.ticket_inserts.append(executemany)
+
+    def ports(self, *ports, **kwargs):
+        objects = []
+        for port in ports:
+            obj = PortDatabase()
+            obj.user_id = kwargs.get('user_id', 1)
+            obj.service_group_id = 1
+            obj.port = port
+            objects.append(obj)
+        return objects
+
+    def counters(self):
+        return sorted((c.user_id, c.table, c.count)
+                      for c in UsageCounters.query())
+
+    def test_save_many(self):
+        ports = PortDatabase.save_many(self.ports(1000, 1001, 1002),
+                                       commit=True)
+        self.assertEqual(sorted(p.id for p in ports), [1, 2, 3])
+        self.assertEqual(PortDatabase.query().count(), 3)
+        groups = TicketGroupDatabase.query().all()
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(set(p.ticket_group_id for p in ports),
+                         set([groups[0].id]))
+        tickets = TicketDatabase.query().all()
+        self.assertEqual(len(tickets), 6)
+        self.assertEqual(self.ticket_inserts, [True])
+        self.assertTrue(all("'id': " in t.new_data for t in tickets))
+        self.assertEqual(self.counters(), [(1, 'port', 3)])
+
+    def test_waiting(self):
+        ports = self.ports(1000, 1001)
+        ports[0].waiting = True
+        PortDatabase.save_many(ports, commit=True)
+        self.assertEqual(TicketDatabase.query().count(), 2)
+        self.assertEqual(ports[0].ticket_group_id, None)
+
+    def test_rollback(self):
+        PortDatabase.save_many(self.ports(1000, 1001))
+        self.assertEqual(self.counters(), [(1, 'port', 2)])
+        dbsession.rollback()
+        self.assertEqual(PortDatabase.query().count(), 0)
+        self.assertEqual(TicketDatabase.query().count(), 0)
+        self.assertEqual(self.counters(), [])
+
+    def test_invalidation(self):
+        changes = []
+        invalidation.watch([PortDatabase], changes.extend)
+        try:
+            PortDatabase.save_many(self.ports(1000, 1001))
+        finally:
+            invalidation._watchers.pop()
+        self.assertEqual(sorted(changes), [(PortDatabase, 1),
+                                           (PortDatabase, 2)])
+
+    def test_missing_owner(self):
+        self.assertRaises(DoesNotExist, PortDatabase.save_many,
+                          self.ports(1000) + self.ports(1001, user_id=3))
+        self.assertEqual(PortDatabase.query().count(), 0)
+
+    def test_quota(self):
+        user = User()
+        PortDatabase.save_many(self.ports(*range(1000, 1005)), user=user)
+        self.assertRaises(SoftLimitReached, PortDatabase.save_many,
+                          self.ports(2000), user=user)
+        self.assertRaises(HardLimitReached, PortDatabase.save_many,
+                          self.ports(*range(2000, 2006)), user=user)
+        # Quota of every owner is checked
+        self.assertRaises(HardLimitReached, PortDatabase.save_many,
+                          self.ports(*range(3000, 3011), user_id=2),
+                          user=user)
+        PortDatabase.save_many(self.ports(*range(2000, 2006)),
+                               user=User('pass_limits'))
+        self.assertEqual(PortDatabase.query().count(), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
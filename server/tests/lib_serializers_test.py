@@ -0,0 +1,44 @@
+# encoding: utf-8
+
+
+import unittest
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.ext.declarative import declarative_base
+from lib.database.serializers import get_serializer
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'serializer_test_item'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    created = Column(DateTime)
+    deleted = Column(Integer)
+
+
+class TestSerializer(unittest.TestCase):
+    def test_serialize(self):
+        item = Item(id=1, name='test', created=datetime(2014, 1, 2, 3, 4, 5),
+                    deleted=None)
+        self.assertEqual(get_serializer(Item)(item),
+                         {'id': 1, 'name': 'test',
+                          'created': '2014-01-02 03:04:05'})
+
+    def test_null_datetime(self):
+        item = Item(id=1, name='test')
+        self.assertEqual(get_serializer(Item)(item)['created'], None)
+
+    def test_cached(self):
+        self.assertTrue(get_serializer(Item) is get_serializer(Item))
+
+    def test_from_values(self):
+        serializer = get_serializer(Item)
+        self.assertEqual(serializer.keys, ['id', 'name', 'created'])
+        self.assertEqual(serializer.from_values((2, 'row', None)),
+                         {'id': 2, 'name': 'row', 'created': None})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+# encoding: utf-8
+
+
+import unittest
+import webtest
+from bottle import Bottle, HTTPResponse
+from sqlalchemy import create_engine
+from lib import renki_settings as settings
+from lib.exceptions import RenkiHTTPError
+from lib.database import instrumentation
+
+
+class TestSQLInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        instrumentation.instrument(self.engine)
+        self._threshold = settings.SQL_NPLUSONE_THRESHOLD
+        settings.SQL_NPLUSONE_THRESHOLD = 3
+
+    def tearDown(self):
+        settings.SQL_NPLUSONE_THRESHOLD = self._threshold
+        instrumentation.end()
+        instrumentation.route_stats.pop('test', None)
+
+    def test_count(self):
+        instrumentation.begin('test')
+        self.engine.execute('SELECT 1')
+        self.engine.execute('SELECT 2')
+        req = instrumentation.end()
+        self.assertEqual(req.statements, 2)
+        self.assertEqual(req.nplusone, [])
+        self.assertEqual(instrumentation.get_stats()['test']['statements'], 2)
+
+    def test_nplusone(self):
+        instrumentation.begin('test')
+        for i in range(4):
+            self.engine.execute('SELECT ?', i)
+        req = instrumentation.end()
+        self.assertEqual(req.nplusone, ['SELECT ?'])
+
+    def test_no_request(self):
+        self.engine.execute('SELECT 1')
+        self.assertEqual(instrumentation.current(), None)
+
+    def test_plugin_stream(self):
+        class Route(object):
+            method = 'GET'
+            rule = '/test'
+
+        def route():
+            def generate():
+                for i in range(3):
+                    self.engine.execute('SELECT 1')
+                    yield str(i)
+            return generate()
+        wrapper = instrumentation.SQLStatsPlugin().apply(route, Route())
+        stream = wrapper()
+        self.assertEqual(instrumentation.current().name, 'GET /test')
+        self.assertEqual(list(stream), ['0', '1', '2'])
+        self.assertEqual(instrumentation.current(), None)
+        self.assertEqual(
+            instrumentation.get_stats()['GET /test']['statements'], 3)
+        instrumentation.route_stats.pop('GET /test', None)
+
+    def test_plugin_headers(self):
+        app = Bottle()
+        app.install(instrumentation.SQLStatsPlugin())
+
+        @app.get('/ok')
+        def ok_route():
+            self.engine.execute('SELECT 1')
+            return 'ok'
+
+        @app.get('/returned')
+        def returned_route():
+            self.engine.execute('SELECT 1')
+            return HTTPResponse('created', status=201)
+
+        @app.get('/error')
+        def error_route():
+            self.engine.execute('SELECT 1')
+            self.engine.execute('SELECT 2')
+            raise RenkiHTTPError('Failure')
+
+        debug = settings.DEBUG
+        settings.DEBUG = True
+        try:
+            client = webtest.TestApp(app)
+            for path, status, count in (('/ok', 200, '1'),
+                                        ('/returned', 201, '1'),
+                                        ('/error', 500, '2')):
+                res = client.get(path, status=status)
+                self.assertEqual(res.headers['X-Renki-SQL-Count'], count)
+                self.assertTrue('X-Renki-SQL-Time' in res.headers)
+        finally:
+            settings.DEBUG = debug
+            for path in ('/ok', '/returned', '/error'):
+                instrumentation.route_stats.pop('GET %s' % path, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# encoding: utf-8
+
+
+import unittest
+import sqlite3
+from sqlalchemy import exc
+from lib import stats
+from lib.database.pool import RenkiQueuePool
+
+
+class TestStats(unittest.TestCase):
+    def tearDown(self):
+        stats.unregister('test')
+        stats.unregister('broken')
+
+    def test_collect(self):
+        stats.register('test', lambda: {'value': 1})
+        self.assertEqual(stats.collect()['test'], {'value': 1})
+        stats.unregister('test')
+        self.assertFalse('test' in stats.collect())
+
+    def test_broken_source(self):
+        stats.register('broken', lambda: 1 / 0)
+        self.assertEqual(stats.collect()['broken'], None)
+
+
+class TestPoolStats(unittest.TestCase):
+    def setUp(self):
+        self.pool = RenkiQueuePool(lambda: sqlite3.connect(':memory:'),
+                                   pool_size=1, max_overflow=1, timeout=0.1)
+
+    def test_checkout(self):
+        conn = self.pool.connect()
+        s = self.pool.stats()
+        self.assertEqual(s['checked_out'], 1)
+        self.assertEqual(s['checkouts'], 1)
+        conn.close()
+        self.assertEqual(self.pool.stats()['checked_out'], 0)
+
+    def test_timeout(self):
+        conns = [self.pool.connect(), self.pool.connect()]
+        self.assertEqual(self.pool.stats()['overflow'], 1)
+        with self.assertRaises(exc.TimeoutError):
+            self.pool.connect()
+        s = self.pool.stats()
+        self.assertEqual(s['timeouts'], 1)
+        self.assertTrue(s['max_wait_time'] >= 0.1)
+        for conn in conns:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+# encoding: utf-8
+
+
+import unittest
+import json
+from sqlalchemy import Column, Integer, String, create_engine, event
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from lib.database.streaming import stream_list
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = 'streaming_test_item'
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class TestStreamList(unittest.TestCase):
+    def setUp(self):
+        self.engine = engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+        for i in range(1, 6):
+            self.session.add(Item(id=i, name='item%d' % i))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def stream(self, query, chunk_size):
+        return list(stream_list('items', query, data={'next': None},
+                                chunk_size=chunk_size))
+
+    def test_chunks(self):
+        query = self.session.query(Item).order_by(Item.id)
+        chunks = self.stream(query, 2)
+        # head, three chunks of rows and tail
+        self.assertEqual(len(chunks), 5)
+        data = json.loads(''.join(chunks))
+        self.assertEqual(data['status'], 'OK')
+        self.assertEqual(data['next'], None)
+        self.assertEqual(data['items'][0], {'id': 1, 'name': 'item1'})
+        self.assertEqual([x['id'] for x in data['items']], [1, 2, 3, 4, 5])
+
+    def test_empty(self):
+        query = self.session.query(Item).filter(Item.id < 0)
+        data = json.loads(''.join(self.stream(query, 2)))
+        self.assertEqual(data['items'], [])
+
+    def test_transaction(self):
+        # Read-only sessions are autocommit, stream has own transaction
+        session = sessionmaker(bind=self.engine.execution_options(
+                                    isolation_level='AUTOCOMMIT'))()
+        executed = []
+        events = []
+
+        @event.listens_for(self.engine, 'before_cursor_execute')
+        def execute(conn, cursor, statement, parameters, context,
+                    executemany):
+            executed.append((conn.get_execution_options().get(
+                                'isolation_level'),
+                             context.execution_options.get('stream_results')))
+        event.listen(self.engine, 'begin', lambda c: events.append('begin'))
+        event.listen(self.engine, 'rollback',
+                     lambda c: events.append('rollback'))
+        query = session.query(Item).order_by(Item.id)
+        data = json.loads(''.join(self.stream(query, 2)))
+        self.assertEqual(len(data['items']), 5)
+        self.assertEqual(executed, [('SERIALIZABLE', True)])
+        self.assertEqual(events, ['begin', 'rollback'])
+        session.close()
+
+    def test_close(self):
+        # Client disconnecting ends transaction of stream
+        events = []
+        event.listen(self.engine, 'rollback',
+                     lambda c: events.append('rollback'))
+        query = self.session.query(Item).order_by(Item.id)
+        stream = stream_list('items', query, chunk_size=2)
+        next(stream)
+        next(stream)
+        self.assertEqual(events, [])
+        stream.close()
+        self.assertEqual(events, ['rollback'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# encoding: utf-8
+
+
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from lib.auth.db import Users
+from lib.database import connection
+from lib.database.connection import session as dbsession
+from lib.database.tables import metadata
+from lib.exceptions import DoesNotExist, Invalid
+
+
+class Connection(object):
+    """
+    Database connection of dbsession using sqlite engine
+    """
+    def __init__(self, engine):
+        self.sessionmaker = sessionmaker(bind=engine)
+
+    def create_session(self):
+        return self.sessionmaker()
+
+
+class TestGetMany(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        metadata.create_all(self.engine)
+        self._conn = connection.conn
+        connection.conn = Connection(self.engine)
+        dbsession.begin_request()
+        for user_id in (1, 2, 3):
+            dbsession.session().add(Users(id=user_id, name='u%d' % user_id))
+        dbsession.commit()
+        dbsession.session().expunge_all()
+        self.selects = []
+        event.listen(self.engine, 'before_cursor_execute', self.on_execute)
+
+    def tearDown(self):
+        dbsession.end_request()
+        connection.conn = self._conn
+
+    def on_execute(self, conn, cursor, statement, parameters, context,
+                   executemany):
+        if statement.startswith('SELECT'):
+            self.selects.append(statement)
+
+    def test_order(self):
+        users = Users.get_many([3, 1, '2', 1])
+        self.assertEqual([u.id for u in users], [3, 1, 2, 1])
+        self.assertEqual(len(self.selects), 1)
+        self.assertTrue(' IN ' in self.selects[0])
+
+    def test_loaded(self):
+        user = Users.get(2)
+        self.selects = []
+        self.assertEqual(Users.get_many([2]), [user])
+        self.assertEqual(self.selects, [])
+        users = Users.get_many([1, 2])
+        self.assertTrue(users[1] is user)
+        self.assertEqual(len(self.selects), 1)
+
+    def test_missing(self):
+        with self.assertRaises(DoesNotExist) as cm:
+            Users.get_many([5, 1, 4])
+        self.assertEqual(cm.exception.missing, [4, 5])
+        self.assertTrue('4, 5' in str(cm.exception))
+
+    def test_invalid(self):
+        self.assertRaises(Invalid, Users.get_many, [1, 'a'])
+        self.assertRaises(Invalid, Users.get_many, [None])
+
+    def test_empty(self):
+        self.assertEqual(Users.get_many([]), [])
+        self.assertEqual(self.selects, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+# encoding: utf-8
+
+
+import time
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from lib.communication import topology
+from lib.communication.ticket import PENDING_KEY
+from lib.communication.ticket_tables import TicketDatabase, \
+    TicketGroupDatabase
+from lib.communication.topology import Service
+from lib.database.tables import metadata
+from lib.history_meta import versioned_session
+import lib.auth.db
+from modules.port.port_database import PortDatabase
+
+
+class TestTickets(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        versioned_session(Session)
+        self.session = Session()
+        self.ticket_inserts = []
+        event.listen(self.engine, 'before_cursor_execute', self.on_execute)
+        topology.topology_cache.set(topology.TOPOLOGY_KEY, {
+            1: (Service(1, 'web', 1), Service(2, 'web', 2))},
+            time.time() + 60)
+
+    def tearDown(self):
+        self.session.close()
+        topology.invalidate_topology()
+
+    def on_execute(self, conn, cursor, statement, parameters, context,
+                   executemany):
+        if statement.startswith('INSERT INTO ticket '):
+            self.ticket_inserts.append(executemany)
+
+    def add_ports(self, *ports, **kwargs):
+        objects = []
+        for port in ports:
+            obj = PortDatabase()
+            obj.user_id = 1
+            obj.service_group_id = 1
+            obj.port = port
+            obj.waiting = kwargs.get('waiting', False)
+            self.session.add(obj)
+            objects.append(obj)
+        self.session.commit()
+        return objects
+
+    def tickets(self):
+        return self.session.query(TicketDatabase).order_by(
+                    TicketDatabase.id).all()
+
+    def test_insert(self):
+        ports = self.add_ports(1000, 1001, 1002)
+        groups = self.session.query(TicketGroupDatabase).all()
+        self.assertEqual(len(groups), 1)
+        tickets = self.tickets()
+        self.assertEqual(len(tickets), 6)
+        self.assertEqual(self.ticket_inserts, [True])
+        self.assertEqual(set(t.old_data for t in tickets), set(['new']))
+        self.assertEqual(set(t.ticket_group_id for t in tickets),
+                         set([groups[0].id]))
+        self.assertEqual(set(p.ticket_group_id for p in ports),
+                         set([groups[0].id]))
+        self.assertFalse(PENDING_KEY in self.session.info)
+
+    def test_update(self):
+        port, other = self.add_ports(1000, 1001)
+        port.port = 2000
+        # Unchanged object doesn't get ticket
+        other.port = 1001
+        self.session.commit()
+        tickets = self.tickets()[4:]
+        self.assertEqual(len(tickets), 2)
+        self.assertEqual(set(t.old_data for t in tickets), set(['old']))
+        self.assertTrue(all("'port': 2000" in t.new_data for t in tickets))
+        self.assertEqual(port.ticket_group_id, tickets[0].ticket_group_id)
+
+    def test_delete(self):
+        port, = self.add_ports(1000)
+        self.session.delete(port)
+        self.session.commit()
+        tickets = self.tickets()[2:]
+        self.assertEqual([t.new_data for t in tickets], ['deleted'] * 2)
+        self.assertTrue(all("'port': 1000" in t.old_data for t in tickets))
+
+    def test_waiting(self):
+        port, = self.add_ports(1000, waiting=True)
+        self.assertEqual(self.tickets(), [])
+        self.assertEqual(port.ticket_group_id, None)
+
+    def test_failed_flush(self):
+        self.add_ports(1000)
+        self.assertRaises(IntegrityError, self.add_ports, 1000)
+        self.assertFalse(PENDING_KEY in self.session.info)
+        self.session.rollback()
+        port, = self.add_ports(1001)
+        # Rolled back ticket group isn't reused
+        self.assertNotEqual(self.session.query(TicketGroupDatabase).get(
+                                port.ticket_group_id), None)
+        tickets = self.tickets()[2:]
+        self.assertEqual(len(tickets), 2)
+        self.assertEqual(set(t.ticket_group_id for t in tickets),
+                         set([port.ticket_group_id]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# encoding: utf-8
+
+
+import time
+import unittest
+from lib.communication import topology
+from lib.communication.topology import Service, get_services, \
+    invalidate_topology, topology_cache, TOPOLOGY_KEY
+from lib.exceptions import DoesNotExist
+
+
+class TestTopology(unittest.TestCase):
+    def setUp(self):
+        self.services = (Service(1, 'web', 2), Service(2, 'mail', 3))
+        topology_cache.set(TOPOLOGY_KEY, {1: self.services, 2: ()},
+                           time.time() + 60)
+
+    def tearDown(self):
+        invalidate_topology()
+
+    def test_get_services(self):
+        self.assertEqual(get_services(1), self.services)
+        self.assertEqual(get_services('1'), self.services)
+        self.assertEqual(get_services(2), ())
+
+    def test_missing_group(self):
+        for service_group_id in (3, None, 'a'):
+            self.assertRaises(DoesNotExist, get_services, service_group_id)
+
+    def test_invalidate(self):
+        generation = topology._generation
+        invalidate_topology()
+        self.assertEqual(topology_cache.get(TOPOLOGY_KEY), None)
+        self.assertEqual(topology._generation, generation + 1)
+        self.assertFalse(topology.get_stats()['loaded'])
+
+    def test_expire(self):
+        # Changes made by other processes are seen after expiration
+        topology_cache.set(TOPOLOGY_KEY, {1: self.services}, time.time() - 1)
+        self.assertEqual(topology_cache.get(TOPOLOGY_KEY), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+# encoding: utf-8
+
+
+import unittest
+from lib import renki_settings as settings
+from lib.database import connection
+
+
+class FakeQuery(object):
+    def scalar(self):
+        return 1234
+
+
+class FakeSession(object):
+    def __init__(self):
+        self.queries = 0
+
+    def query(self, *args):
+        self.queries += 1
+        return FakeQuery()
+
+
+class TestTransactionTrace(unittest.TestCase):
+    def setUp(self):
+        self._sample = settings.DB_TRACE_TXID_SAMPLE
+
+    def tearDown(self):
+        settings.DB_TRACE_TXID_SAMPLE = self._sample
+
+    def test_disabled(self):
+        settings.DB_TRACE_TXID_SAMPLE = 0
+        ses = FakeSession()
+        for i in range(10):
+            connection.log_transaction_id(ses, "Commit")
+        self.assertEqual(ses.queries, 0)
+
+    def test_sampled(self):
+        settings.DB_TRACE_TXID_SAMPLE = 5
+        ses = FakeSession()
+        for i in range(10):
+            connection.log_transaction_id(ses, "Commit")
+        self.assertEqual(ses.queries, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
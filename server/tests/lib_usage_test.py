@@ -0,0 +1,211 @@
+# encoding: utf-8
+
+
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from lib.auth import db
+from lib.database import connection, usage
+from lib.database.connection import session as dbsession
+from lib.database.tables import metadata
+from lib.database.usage import usage_deltas, is_counted, UsageCounters, \
+    usage_report, add_usage, reconcile
+from lib.history_meta import versioned_session
+from modules.port.port_database import PortDatabase
+
+
+class Port(object):
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+
+class TestUsageCounters(unittest.TestCase):
+    def test_deltas(self):
+        deltas = usage_deltas([Port(1), Port(1), Port(2)], [Port(2), Port(3)])
+        self.assertEqual(dict(deltas), {(Port, 1): 2, (Port, 2): 0,
+                                        (Port, 3): -1})
+
+    def test_counted(self):
+        self.assertTrue(is_counted(PortDatabase))
+        self.assertFalse(is_counted(PortDatabase.__history_mapper__.class_))
+        self.assertFalse(is_counted(UsageCounters))
+
+
+class Connection(object):
+    """
+    Database connection of dbsession using sqlite engine
+    """
+    def __init__(self, engine):
+        self.sessionmaker = sessionmaker(bind=engine)
+        versioned_session(self.sessionmaker)
+
+    def create_session(self):
+        return self.sessionmaker()
+
+
+class TestUsageUpdates(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://')
+        metadata.create_all(self.engine)
+        self._conn = connection.conn
+        connection.conn = Connection(self.engine)
+        dbsession.begin_request()
+        self.session = dbsession.session()
+
+    def tearDown(self):
+        dbsession.end_request()
+        connection.conn = self._conn
+
+    def counters(self):
+        return sorted((c.user_id, c.table, c.count)
+                      for c in self.session.query(UsageCounters))
+
+    def add_port(self, port, user_id=1):
+        obj = PortDatabase()
+        obj.user_id = user_id
+        obj.port = port
+        self.session.add(obj)
+        return obj
+
+    def insert_rows(self, *ports):
+        self.session.execute(PortDatabase.__table__.insert(), [
+            {'user_id': 1, 'port': port, 'comment': '', 'waiting': False}
+            for port in ports])
+
+    def test_seed_from_count(self):
+        # Rows inserted before first counter update are counted
+        self.insert_rows(1000, 1001)
+        savepoints = []
+        event.listen(self.engine, 'savepoint',
+                     lambda conn, name: savepoints.append(name))
+        add_usage(self.session.connection(), {(PortDatabase, 1): 1})
+        self.assertEqual(len(savepoints), 1)
+        self.assertEqual(self.counters(), [(1, 'port', 2)])
+        self.insert_rows(1002)
+        add_usage(self.session.connection(), {(PortDatabase, 1): 1})
+        self.assertEqual(self.counters(), [(1, 'port', 3)])
+        self.assertEqual(len(savepoints), 1)
+
+    def test_concurrent_seed(self):
+        # Counter created by other transaction after failed update is
+        # incremented
+        self.insert_rows(1000)
+        add_usage(self.session.connection(), {(PortDatabase, 1): 1})
+        increment = usage._increment
+        calls = []
+
+        def missing_first(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                return False
+            return increment(*args)
+        usage._increment = missing_first
+        try:
+            self.insert_rows(1001)
+            add_usage(self.session.connection(), {(PortDatabase, 1): 1})
+        finally:
+            usage._increment = increment
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.counters(), [(1, 'port', 2)])
+
+    def test_flush(self):
+        ports = [self.add_port(1000), self.add_port(1001)]
+        self.session.commit()
+        self.assertEqual(self.counters(), [(1, 'port', 2)])
+        self.session.delete(ports[0])
+        self.session.commit()
+        self.assertEqual(self.counters(), [(1, 'port', 1)])
+        ports[1].user_id = 2
+        self.session.commit()
+        self.assertEqual(self.counters(), [(1, 'port', 0), (2, 'port', 1)])
+
+    def test_reconcile(self):
+        self.add_port(1000)
+        self.session.commit()
+        self.insert_rows(1001)
+        self.session.execute(PortDatabase.__table__.insert(), {
+            'user_id': 2, 'port': 1002, 'comment': '', 'waiting': False})
+        self.session.commit()
+        self.assertEqual(reconcile([PortDatabase]), 2)
+        self.assertEqual(self.counters(), [(1, 'port', 2), (2, 'port', 1)])
+        self.assertEqual(reconcile([PortDatabase]), 0)
+
+    def test_reconcile_locks(self):
+        statement = usage._locked_counters(PortDatabase)
+        self.assertTrue('FOR UPDATE' in
+                        str(statement.compile(dialect=postgresql.dialect())))
+
+
+class TestUsageReport(unittest.TestCase):
+    def test_report(self):
+        engine = create_engine('sqlite://')
+        port = PortDatabase.__table__
+        metadata.create_all(engine, tables=[port, db.Limits.__table__,
+                                            db.DefaultLimits.__table__])
+        engine.execute(port.insert(), [
+            {'user_id': 1, 'port': 1000, 'comment': '', 'waiting': False},
+            {'user_id': 1, 'port': 1001, 'comment': '', 'waiting': False},
+            {'user_id': 2, 'port': 1002, 'comment': '', 'waiting': False}])
+        engine.execute(db.DefaultLimits.__table__.insert(),
+                       table='port', soft_limit=1, hard_limit=2)
+        engine.execute(db.Limits.__table__.insert(),
+                       users_id=2, table='port', soft_limit=3, hard_limit=4)
+        rows = [tuple(row) for row in
+                engine.execute(usage_report([PortDatabase]))]
+        self.assertEqual(rows, [(1, 'port', 2, 1, 2), (2, 'port', 1, 3, 4)])
+
+    def test_same_as_enforced(self):
+        # Duplicate and missing limits are resolved same way in report and
+        # in quota checks
+        engine = create_engine('sqlite://')
+        port = PortDatabase.__table__
+        limits, defaults = db.Limits.__table__, db.DefaultLimits.__table__
+        metadata.create_all(engine, tables=[port, limits, defaults])
+        engine.execute(port.insert(), [
+            {'user_id': 1, 'port': 1000, 'comment': '', 'waiting': False},
+            {'user_id': 2, 'port': 1001, 'comment': '', 'waiting': False}])
+        engine.execute(defaults.insert(), [
+            {'table': 'port', 'soft_limit': 3, 'hard_limit': None},
+            {'table': 'port', 'soft_limit': 1, 'hard_limit': 8}])
+        engine.execute(limits.insert(), [
+            {'users_id': 2, 'table': 'port', 'soft_limit': None,
+             'hard_limit': 4},
+            {'users_id': 2, 'table': 'port', 'soft_limit': None,
+             'hard_limit': 6}])
+        db._default_limits = db.combine_limits(
+                                engine.execute(defaults.select()))
+        for user_id in (1, 2):
+            db.limits_cache.set(user_id, db.combine_limits(
+                engine.execute(limits.select().where(
+                               limits.c.users_id == user_id))))
+        try:
+            for row in engine.execute(usage_report([PortDatabase])):
+                self.assertEqual(
+                    PortDatabase.get_limits_for_user(row.user_id),
+                    {'soft_limit': row.soft_limit,
+                     'hard_limit': row.hard_limit})
+        finally:
+            db._default_limits = None
+            db.limits_cache.clear()
+
+
+class TestLimitsCache(unittest.TestCase):
+    def tearDown(self):
+        db._default_limits = None
+        db.limits_cache.clear()
+
+    def test_invalidate(self):
+        db._default_limits = {'port': (1, 2)}
+        db.limits_cache.set(1, {'port': (3, 4)})
+        self.assertEqual(db.get_default_limits('port'), (1, 2))
+        self.assertEqual(db.get_user_limits(1, 'port'), (3, 4))
+        db.invalidate_limits([(db.Limits, 5)])
+        self.assertEqual(db.limits_cache.get(1), None)
+        self.assertEqual(db._default_limits, {'port': (1, 2)})
+        db.invalidate_limits([(db.DefaultLimits, 1)])
+        self.assertEqual(db._default_limits, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,10 @@
 # encoding: utf-8
 
 from lib.test_utils import *
+from modules.domain.domain_database import DomainDatabase
+from contextlib import redirect_stdout
+import admin
+import io
 
 
 class TestIndexRoute(BasicTest):
@@ -67,6 +71,50 @@ class TestErrorRoute(BasicTest):
         u = self.user('test', [])
         self.assertQ('/error', user=u, status=STATUS_ERROR)
 
+class TestUsageRoute(BasicTest):
+    """
+    Test /usage route and admin.py --usage-report
+    """
+
+    def add_domain(self, user, name):
+        domain = DomainDatabase()
+        domain.user_id = user.user.id
+        domain.name = name
+        connection.session.add(domain)
+        connection.session.commit()
+
+    def test_usage_get_anon(self):
+        self.assertQ('/usage', user=None, status=STATUS_NOAUTH)
+
+    def test_usage_get_no_perms(self):
+        u = self.user('test', [])
+        self.assertQ('/usage', user=u, status=STATUS_DENIED)
+
+    def test_usage_get(self):
+        """
+        Test GET /usage route, response is streamed from own transaction
+        """
+        u = self.user('test', ['usage_view_all'])
+        self.add_domain(u, 'example.com')
+        self.add_domain(u, 'example.net')
+        q = self.q('/usage', user=u)
+        self.assertStatus(q, STATUS_OK)
+        self.assertEqual(q.json['usage'], [
+            {'user_id': u.user.id, 'table': 'domain', 'count': 2,
+             'soft_limit': 5, 'hard_limit': 10}])
+
+    def test_usage_report_command(self):
+        u = self.user('test', [])
+        self.add_domain(u, 'example.com')
+        out = io.StringIO()
+        with redirect_stdout(out):
+            admin.usage_report()
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ['user_id', 'table', 'count',
+                                            'soft_limit', 'hard_limit'])
+        self.assertEqual(lines[1].split(), [str(u.user.id), 'domain', '1',
+                                            '5', '10'])
+
 if __name__ == "__main__":
     import unittest
     unittest.main()